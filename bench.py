@@ -0,0 +1,361 @@
+import os
+import sys
+import time
+import json
+import sqlite3
+import argparse
+import resource
+import tempfile
+import subprocess
+import importlib
+import statistics
+import contextlib
+import metrics
+
+# Pomiary wydajności uruchamiane z wiersza poleceń, np.:
+#   python bench.py db --dirs /dev/shm .
+#   python bench.py decode katalog_z_jpg --size 180 180
+#   python bench.py e2e --latency 0.05 --pages 3
+#   python bench.py e2e --archive nasa.archive --latency 0.05   (odpowiedzi nagrane z NASA, bez sieci)
+#   python bench.py startup --runs 5
+# Wyniki są wypisywane jako JSON, aby można je było porównywać między wersjami
+
+PAGES = 50 # Liczba zapisywanych stron w pomiarze bazy
+PAGE_SIZE = 20 # Liczba zdjęć na stronie
+E2E_TARGETS = ('nasa_baza', 'pygra') # Przeglądarki mierzone z lokalnym serwerem (fake_api)
+E2E_QUERY = 'mars' # Zapytanie w pomiarze e2e
+E2E_TIMEOUT = 30 # Najdłuższe czekanie na wczytanie strony (w sekundach)
+E2E_QUIET = 0.2 # Po tylu sekundach bez zapytań uznajemy, że praca w tle się skończyła
+STARTUP_RUNS = 5 # Liczba mierzonych uruchomień w pomiarze startu (każde w nowym procesie)
+
+# Przykładowe adresy miniaturek jednej strony
+def sample_page(page):
+    return [f"https://images-assets.nasa.gov/image/PIA{page:03d}{i:02d}/PIA{page:03d}{i:02d}~small.jpg" for i in range(PAGE_SIZE)]
+
+# Te same zdjęcia jako wyniki z nasa_api.parse_record
+def sample_records(page):
+    return [
+        {'nasa_id': url.split('/')[-2], 'thumb_url': url, 'title': '', 'description': '', 'keywords': [], 'date_created': None}
+        for url in sample_page(page)
+    ]
+
+# Zapis strony tak jak przed zmianą: domyślny dziennik i commit po każdym wierszu
+def insert_page_old(conn, query, page, thumb_urls):
+    c = conn.cursor()
+    for i, thumb_url in enumerate(thumb_urls):
+        c.execute(
+            'INSERT OR REPLACE INTO cache(query,page,img_index,thumb_url,full_url) VALUES (?,?,?,?,?)',
+            (query, page, i, thumb_url, thumb_url)
+        )
+        conn.commit()
+
+def open_old(path):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS cache (query TEXT, page INTEGER, img_index INTEGER, '
+        'thumb_url TEXT, full_url TEXT, PRIMARY KEY (query, page, img_index))'
+    )
+    conn.commit()
+    return conn
+
+# Czas zapisu jednej strony (w ms) dla obu wariantów w podanym katalogu
+def bench_db(directory):
+    import nasa_cache
+    results = {}
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        conn = open_old(os.path.join(tmp, 'old.db'))
+        times = []
+        for page in range(PAGES):
+            start = time.perf_counter()
+            insert_page_old(conn, 'mars', page, sample_page(page))
+            times.append(1000 * (time.perf_counter() - start))
+        conn.close()
+        results['per_row_commit'] = summarize(times)
+
+        conn = nasa_cache.init_db(os.path.join(tmp, 'new.db'))
+        qid = nasa_cache.query_id(conn, 'mars')
+        times = []
+        for page in range(PAGES):
+            start = time.perf_counter()
+            nasa_cache.save_page(conn, qid, page, sample_records(page))
+            times.append(1000 * (time.perf_counter() - start))
+        conn.close()
+        results['wal_executemany'] = summarize(times)
+    return results
+
+# Mediana, p95 i średnia z listy czasów
+def summarize(times):
+    times = sorted(times)
+    return {
+        'median_ms': round(statistics.median(times), 3),
+        'p95_ms': round(metrics.percentile(times, 0.95), 3),
+        'mean_ms': round(statistics.mean(times), 3),
+    }
+
+# Dekodowanie wszystkich plików JPG z katalogu jednym sposobem (uruchamiane w osobnym procesie,
+# aby szczyt pamięci RSS dotyczył tylko tego sposobu)
+def decode_worker(mode, directory, size):
+    import image_pipeline
+    decode = image_pipeline.decode_full if mode == 'full' else image_pipeline.decode_scaled
+    files = sorted(f for f in os.listdir(directory) if f.lower().endswith(('.jpg', '.jpeg')))
+    blobs = []
+    for name in files:
+        with open(os.path.join(directory, name), 'rb') as f:
+            blobs.append(f.read())
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    times = []
+    for data in blobs:
+        start = time.perf_counter()
+        decode(data, size)
+        times.append(1000 * (time.perf_counter() - start))
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result = summarize(times) if times else {}
+    result['files'] = len(times)
+    result['peak_rss_delta_kb'] = peak_kb - baseline_kb  # Największy przyrost pamięci przy pojedynczym zdjęciu
+    return result
+
+# Porównanie pełnego dekodowania z dekodowaniem w zmniejszonej skali
+def bench_decode(directory, size):
+    results = {}
+    for mode in ('full', 'draft'):
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), 'decode-worker', mode, directory, str(size[0]), str(size[1])],
+            capture_output=True, text=True, check=True
+        ).stdout
+        results[mode] = json.loads(out)
+    return results
+
+# Czekanie, aż wszystkie miniaturki będą wczytane; zwraca False po przekroczeniu czasu
+def wait_loaded(tiles, timeout=E2E_TIMEOUT):
+    deadline = time.perf_counter() + timeout
+    while not all(tile.loaded for tile in tiles):
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(0.002)
+    return True
+
+# Czekanie, aż serwer przez chwilę nie dostanie żadnego zapytania (np. o adresy pełnych zdjęć)
+def wait_idle(api, quiet=E2E_QUIET, timeout=E2E_TIMEOUT):
+    deadline = time.perf_counter() + timeout
+    last = api.stats()['requests']
+    while time.perf_counter() < deadline:
+        time.sleep(quiet + api.latency)
+        current = api.stats()['requests']
+        if current == last:
+            return
+        last = current
+
+# Odpowiedzi z archiwum http_client zamiast lokalnego serwera - te same liczniki co fake_api
+class ArchiveApi:
+    def __init__(self, path, latency):
+        self.path = path
+        self.latency = latency
+
+    def start(self):
+        import http_client
+        http_client.use_archive(self.path, 'replay', self.latency)
+        return self
+
+    def stats(self):
+        import http_client
+        stats = http_client.archive_stats() or {'hits': 0, 'misses': 0, 'bytes': 0}  # Brak sesji - brak zapytań
+        return {'requests': stats['hits'] + stats['misses'], 'bytes': stats['bytes'], 'missing': stats['misses']}
+
+    def reset_stats(self):
+        import http_client
+        http_client.reset_archive_stats()
+
+    def stop(self):
+        pass
+
+# Strony 1..pages jednej przeglądarki z lokalnym serwerem (albo z archiwum): najpierw z pustym cache, potem ponownie
+# Uruchamiane w osobnym procesie (szczyt pamięci dotyczy tylko tej przeglądarki)
+# api_base - adres API, z którym nagrano archiwum (pusty - domyślny adres NASA)
+def e2e_worker(target, pages, latency, bandwidth, error_rate, archive='', api_base=''):
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # Bez okna
+    os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'  # Stdout zostaje na wynik JSON
+    import pygame
+    import fake_api
+    import nasa_api
+    import surface_cache
+    import nasa_cache
+    import http_client
+    import metrics
+    if archive:
+        api = ArchiveApi(archive, latency).start()
+    else:
+        api = fake_api.FakeApi(latency=latency, bandwidth=bandwidth, error_rate=error_rate).start()
+        api_base = api.base_url
+    browser = importlib.import_module(target)
+    if api_base:
+        nasa_api.ASSET_BASE = f"{api_base}/asset/"
+        browser.API_BASE = f"{api_base}/search?media_type=image"
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    result = {}
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(sys.stderr):
+        if target == 'nasa_baza':
+            nasa_cache.BLOB_DIR = os.path.join(tmp, 'blobs')
+            nasa_cache.ATLAS_FILE = os.path.join(tmp, 'thumbs.atlas')
+            db_conn = browser.init_db(os.path.join(tmp, 'cache.db'))
+            load = lambda page: browser.fetch_nasa_images(E2E_QUERY, page, db_conn)
+        else:
+            load = lambda page: browser.fetch_nasa_images(E2E_QUERY, page)
+        for phase in ('cold', 'warm'):
+            surface_cache.get_cache().clear()  # Jak po ponownym uruchomieniu - zostaje tylko cache na dysku
+            page_ms, thumbs_ms, failed = [], [], 0
+            api.reset_stats()
+            metrics.get_registry().reset()
+            http_client.reset_coalescing_stats()
+            nasa_cache.IMAGE_FLIGHTS.reset_stats()
+            for page in range(1, pages + 1):
+                start = time.perf_counter()
+                try:
+                    tiles = load(page)
+                except Exception as e:
+                    print("Błąd pobierania strony:", e)
+                    tiles = None
+                page_ms.append(1000 * (time.perf_counter() - start))  # Lista kafelków gotowa
+                if tiles is None or not wait_loaded(tiles):
+                    failed += 1
+                thumbs_ms.append(1000 * (time.perf_counter() - start))  # Wszystkie miniaturki widoczne
+                wait_idle(api)  # Zapytania w tle liczą się do tej strony
+            stats = api.stats()
+            result[phase] = {
+                'page': summarize(page_ms),
+                'thumbnails': summarize(thumbs_ms),
+                'requests_per_page': round(stats['requests'] / pages, 2),
+                'bytes_per_page': round(stats['bytes'] / pages),
+                'requests': stats,
+                'pages_not_loaded': failed,
+                'stages': metrics.get_registry().summary(),  # Czasy etapów (metrics)
+                'coalescing': {'http': http_client.coalescing_stats(), 'images': nasa_cache.IMAGE_FLIGHTS.stats()},
+            }
+    api.stop()
+    result['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+# Jedno uruchomienie nasa_baza z cache w katalogu directory: czas od startu procesu
+# (z importami i otwarciem bazy) do pierwszej klatki z całą stroną miniaturek
+def startup_worker(directory, api_base, atlas):
+    start = time.perf_counter()
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
+    import pygame
+    import nasa_api
+    import nasa_cache
+    import nasa_baza
+    nasa_api.ASSET_BASE = f"{api_base}/asset/"
+    nasa_baza.API_BASE = f"{api_base}/search?media_type=image"
+    nasa_cache.BLOB_DIR = os.path.join(directory, 'blobs')
+    nasa_cache.ATLAS_FILE = os.path.join(directory, 'thumbs.atlas') if atlas else None
+    with contextlib.redirect_stdout(sys.stderr):
+        pygame.display.init()
+        screen = pygame.display.set_mode(nasa_baza.WINDOW_SIZE)
+        db_conn = nasa_baza.init_db(os.path.join(directory, 'cache.db'))
+        tiles = nasa_baza.fetch_nasa_images(E2E_QUERY, 1, db_conn)
+        in_first_frame = sum(tile.loaded for tile in tiles)  # Miniaturki gotowe od razu, bez dekodowania w tle
+        loaded = wait_loaded(tiles)
+        layout = nasa_baza.grid_layout(nasa_baza.WINDOW_SIZE, nasa_baza.THUMB_SCALE)
+        for index, tile in enumerate(tiles):
+            screen.blit(tile.thumb_surface, layout.rect(index, 0))
+        pygame.display.flip()
+        elapsed = 1000 * (time.perf_counter() - start)
+        if nasa_baza.ATLAS is not None:
+            nasa_baza.ATLAS.flush()
+        db_conn.close()
+    return {'ms': round(elapsed, 3), 'loaded_in_first_frame': in_first_frame, 'tiles': len(tiles), 'complete': loaded}
+
+# Start z rozgrzanym cache bez atlasu (dekodowanie JPEG z dysku) i z atlasem (piksele z pliku)
+# Pierwsze uruchomienie każdego wariantu wypełnia cache i nie jest liczone
+def bench_startup(runs):
+    import fake_api
+    api = fake_api.FakeApi().start()
+    results = {'settings': {'runs': runs}}
+    try:
+        for name, atlas in (('no_atlas', 0), ('atlas', 1)):
+            with tempfile.TemporaryDirectory() as tmp:
+                times, report = [], None
+                for run in range(runs + 1):
+                    out = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), 'startup-worker', tmp, api.base_url, str(atlas)],
+                        capture_output=True, text=True, check=True
+                    ).stdout
+                    report = json.loads(out)
+                    if run:
+                        times.append(report['ms'])
+                result = summarize(times)
+                result['loaded_in_first_frame'] = report['loaded_in_first_frame']
+                result['tiles'] = report['tiles']
+                results[name] = result
+    finally:
+        api.stop()
+    return results
+
+# Pomiar wszystkich przeglądarek z tym samym serwerem
+def bench_e2e(pages, latency, bandwidth, error_rate, archive='', api_base=''):
+    results = {'settings': {'pages': pages, 'latency': latency, 'bandwidth': bandwidth, 'error_rate': error_rate, 'archive': archive}}
+    for target in E2E_TARGETS:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), 'e2e-worker', target, str(pages), str(latency), str(bandwidth), str(error_rate),
+             '--archive', archive, '--api-base', api_base],
+            capture_output=True, text=True, check=True
+        ).stdout
+        results[target] = json.loads(out)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pomiary wydajności przeglądarki zdjęć NASA")
+    sub = parser.add_subparsers(dest='command', required=True)
+    db = sub.add_parser('db', help="czas zapisu strony w cache.db")
+    db.add_argument('--dirs', nargs='+', default=['/dev/shm', '.'], help="katalogi z bazą (np. tmpfs i dysk)")
+    decode = sub.add_parser('decode', help="czas dekodowania i pamięć na miniaturkę")
+    decode.add_argument('directory', help="katalog z przykładowymi plikami JPG")
+    decode.add_argument('--size', nargs=2, type=int, default=[180, 180], help="docelowy rozmiar miniaturki")
+    worker = sub.add_parser('decode-worker')  # Wewnętrzne - jeden sposób dekodowania w osobnym procesie
+    worker.add_argument('mode', choices=['full', 'draft'])
+    worker.add_argument('directory')
+    worker.add_argument('width', type=int)
+    worker.add_argument('height', type=int)
+    e2e = sub.add_parser('e2e', help="strony przeglądarek z lokalnym serwerem: opóźnienie, zapytania, bajty, pamięć")
+    e2e.add_argument('--pages', type=int, default=3, help="liczba stron")
+    e2e.add_argument('--latency', type=float, default=0.05, help="opóźnienie odpowiedzi serwera (s)")
+    e2e.add_argument('--bandwidth', type=int, default=0, help="przepustowość na połączenie (B/s, 0 = bez limitu)")
+    e2e.add_argument('--error-rate', type=float, default=0.0, help="odsetek odpowiedzi z błędem (0-1)")
+    e2e.add_argument('--archive', default='', help="odtwarzanie nagranego archiwum HTTP zamiast lokalnego serwera")
+    e2e.add_argument('--api-base', default='', help="adres API, z którym nagrano archiwum (domyślnie NASA)")
+    e2e_worker_parser = sub.add_parser('e2e-worker')  # Wewnętrzne - jedna przeglądarka w osobnym procesie
+    e2e_worker_parser.add_argument('target', choices=E2E_TARGETS)
+    e2e_worker_parser.add_argument('pages', type=int)
+    e2e_worker_parser.add_argument('latency', type=float)
+    e2e_worker_parser.add_argument('bandwidth', type=int)
+    e2e_worker_parser.add_argument('error_rate', type=float)
+    e2e_worker_parser.add_argument('--archive', default='')
+    e2e_worker_parser.add_argument('--api-base', default='')
+    startup = sub.add_parser('startup', help="czas od uruchomienia do pierwszej pełnej siatki (bez atlasu i z atlasem)")
+    startup.add_argument('--runs', type=int, default=STARTUP_RUNS, help="liczba mierzonych uruchomień")
+    startup_worker_parser = sub.add_parser('startup-worker')  # Wewnętrzne - jedno uruchomienie w osobnym procesie
+    startup_worker_parser.add_argument('directory')
+    startup_worker_parser.add_argument('api_base')
+    startup_worker_parser.add_argument('atlas', type=int, choices=[0, 1])
+    args = parser.parse_args(argv)
+
+    if args.command == 'db':
+        report = {d: bench_db(d) for d in args.dirs if os.path.isdir(d)}
+    elif args.command == 'decode':
+        report = bench_decode(args.directory, tuple(args.size))
+    elif args.command == 'decode-worker':
+        report = decode_worker(args.mode, args.directory, (args.width, args.height))
+    elif args.command == 'e2e':
+        report = bench_e2e(args.pages, args.latency, args.bandwidth, args.error_rate, os.path.abspath(args.archive) if args.archive else '', args.api_base)
+    elif args.command == 'e2e-worker':
+        report = e2e_worker(args.target, args.pages, args.latency, args.bandwidth, args.error_rate, args.archive, args.api_base)
+    elif args.command == 'startup':
+        report = bench_startup(args.runs)
+    elif args.command == 'startup-worker':
+        report = startup_worker(args.directory, args.api_base, args.atlas)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+if __name__ == '__main__':
+    main()
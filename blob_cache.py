@@ -0,0 +1,152 @@
+import os
+import time
+import hashlib
+
+TOUCH_BATCH = 64 # Po tylu trafieniach czasy użycia są zapisywane w bazie
+
+# Magazyn bajtów zdjęć na dysku: pliki w podkatalogach, metadane w SQLite
+# Klucz to skrót SHA-1 adresu URL, przy przekroczeniu limitu usuwane są najdawniej używane pliki
+class BlobCache:
+    def __init__(self, conn, lock, directory, max_bytes):
+        self.conn = conn # Połączenie z bazą (wspólne z resztą programu)
+        self.lock = lock # Blokada połączenia
+        self.directory = directory # Katalog z plikami
+        self.max_bytes = max_bytes # Limit zajętego miejsca
+        self.hits = 0 # Liczba trafień
+        self.misses = 0 # Liczba chybień
+        self.evictions = 0 # Liczba usuniętych plików
+        self._touched = {} # Odczytane klucze -> czas, zapisywane w bazie porcjami
+        with self.lock:
+            self.conn.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS blobs (
+                    key TEXT PRIMARY KEY,  -- SHA-1 adresu URL
+                    url TEXT,              -- adres źródłowy
+                    size INTEGER,          -- rozmiar pliku w bajtach
+                    width INTEGER,         -- szerokość po zdekodowaniu
+                    height INTEGER,        -- wysokość po zdekodowaniu
+                    last_access REAL       -- czas ostatniego użycia
+                )
+                '''
+            )
+            self.conn.execute('CREATE INDEX IF NOT EXISTS blobs_last_access ON blobs(last_access)')
+            self.conn.commit()
+            self.total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+
+    # Klucz i ścieżka pliku dla adresu
+    @staticmethod
+    def key_for(url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    # Zwraca bajty z dysku albo None, jeśli ich nie ma
+    def get(self, url):
+        key = self.key_for(url)
+        with self.lock:
+            row = self.conn.execute('SELECT size FROM blobs WHERE key=?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._touched[key] = time.time()  # Bez zapisu przy każdym trafieniu
+            if len(self._touched) >= TOUCH_BATCH:
+                self._flush_touches()
+                self.conn.commit()
+        try:
+            with open(self.path_for(key), 'rb') as f:
+                data = f.read()
+        except OSError:
+            # Plik zniknął z dysku - usuwamy też wpis, o ile w międzyczasie nie usunęło go _evict
+            # (ani put nie zapisał pliku od nowa), aby nie odjąć rozmiaru od total dwa razy
+            with self.lock:
+                row = self.conn.execute('SELECT size FROM blobs WHERE key=?', (key,)).fetchone()
+                if row is not None and not os.path.exists(self.path_for(key)):
+                    self._touched.pop(key, None)
+                    self.conn.execute('DELETE FROM blobs WHERE key=?', (key,))
+                    self.conn.commit()
+                    self.total -= row[0]
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return data
+
+    # Czy adres jest już zapisany (bez odczytu pliku i bez liczenia trafień)
+    def contains(self, url):
+        with self.lock:
+            row = self.conn.execute('SELECT 1 FROM blobs WHERE key=?', (self.key_for(url),)).fetchone()
+        return row is not None and os.path.exists(self.path_for(self.key_for(url)))
+
+    # Zapisuje bajty na dysku i w razie potrzeby zwalnia miejsce
+    def put(self, url, data, width=None, height=None):
+        key = self.key_for(url)
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)  # Zamiana atomowa - nikt nie odczyta połowy pliku
+        with self.lock:
+            row = self.conn.execute('SELECT size FROM blobs WHERE key=?', (key,)).fetchone()
+            if row:
+                self.total -= row[0]
+            self.conn.execute(
+                'INSERT OR REPLACE INTO blobs(key,url,size,width,height,last_access) VALUES (?,?,?,?,?,?)',
+                (key, url, len(data), width, height, time.time())
+            )
+            self.total += len(data)
+            self._flush_touches()  # Usuwanie według aktualnych czasów użycia
+            self._evict()
+            self.conn.commit()
+
+    # Zapis wymiarów zdjęcia po zdekodowaniu (bez zapisu, jeśli są już w bazie)
+    def set_dimensions(self, url, width, height):
+        key = self.key_for(url)
+        with self.lock:
+            row = self.conn.execute('SELECT width, height FROM blobs WHERE key=?', (key,)).fetchone()
+            if row is None or row == (width, height):
+                return
+            self.conn.execute('UPDATE blobs SET width=?, height=? WHERE key=?', (width, height, key))
+            self.conn.commit()
+
+    # Zapis czasów odczytu (wywoływane pod blokadą)
+    def _flush_touches(self):
+        if self._touched:
+            self.conn.executemany('UPDATE blobs SET last_access=? WHERE key=?', [(t, key) for key, t in self._touched.items()])
+            self._touched.clear()
+
+    # Zapis zaległych czasów użycia (np. przy zamykaniu programu)
+    def flush(self):
+        with self.lock:
+            self._flush_touches()
+            self.conn.commit()
+
+    # Usuwa najdawniej używane pliki, dopóki nie zmieścimy się w limicie (wywoływane pod blokadą)
+    def _evict(self):
+        while self.total > self.max_bytes:
+            rows = self.conn.execute('SELECT key, size FROM blobs ORDER BY last_access LIMIT 32').fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self.total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(self.path_for(key))
+                except OSError:
+                    pass
+                self.conn.execute('DELETE FROM blobs WHERE key=?', (key,))
+                self._touched.pop(key, None)
+                self.total -= size
+                self.evictions += 1
+
+    # Liczniki do wyświetlenia lub zapisania w logach
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'bytes': self.total,
+                'max_bytes': self.max_bytes,
+            }
@@ -0,0 +1,244 @@
+import os
+import io
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qs, urlencode
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Lokalny zamiennik images-api.nasa.gov do pomiarów i prób bez internetu, np.:
+#   python fake_api.py --port 8000 --latency 0.08 --bandwidth 500000 --error-rate 0.02 --missing-orig 0.1
+# Obsługuje /search, /asset/<nasa_id> oraz pliki zdjęć /image/<nasa_id>/<nazwa>.jpg
+# Zdjęcia pochodzą z katalogu --fixtures (pliki JPG) albo są generowane przy starcie
+
+TOTAL_HITS = 1000 # Liczba wyników każdego wyszukiwania
+PAGE_SIZE = 100 # Domyślny rozmiar strony wyników (jak w prawdziwym API)
+THUMB_SIZE = (320, 240) # Wymiary generowanych miniaturek
+ORIG_SIZE = (1600, 1200) # Wymiary generowanych pełnych zdjęć
+GENERATED = 8 # Liczba różnych generowanych zdjęć każdego rozmiaru
+CHUNK = 16 * 1024 # Porcja wysyłanych danych przy ograniczonej przepustowości
+BACKLOG = 128 # Kolejka czekających połączeń (domyślne 5 gubi połączenia przy wielu równoległych zapytaniach)
+
+class Server(ThreadingHTTPServer):
+    request_queue_size = BACKLOG
+    daemon_threads = True
+
+# Generowane zdjęcia w jednolitych kolorach (różne dla kolejnych indeksów)
+def generate_images(size, count=GENERATED):
+    from PIL import Image
+    images = []
+    for i in range(count):
+        color = ((i * 67) % 256, (i * 131 + 80) % 256, (i * 29 + 160) % 256)
+        out = io.BytesIO()
+        Image.new('RGB', size, color).save(out, 'JPEG', quality=85)
+        images.append(out.getvalue())
+    return images
+
+# Pliki JPG z katalogu (posortowane, aby wyniki były powtarzalne)
+def load_fixtures(directory):
+    names = sorted(f for f in os.listdir(directory) if f.lower().endswith(('.jpg', '.jpeg')))
+    images = []
+    for name in names:
+        with open(os.path.join(directory, name), 'rb') as f:
+            images.append(f.read())
+    return images
+
+# Serwer z ustawianym opóźnieniem, przepustowością i odsetkiem błędów
+# latency - sekundy przed każdą odpowiedzią, bandwidth - bajty/s na połączenie (0 = bez limitu),
+# error_rate - odsetek zapytań kończonych kodem error_status,
+# missing_orig - odsetek zdjęć bez pliku ~orig.jpg (adres wyprowadzony z miniaturki zwraca 404),
+# opaque_thumbs - podglądy bez końcówki ~small.jpg (pełne zdjęcie tylko z zapytania /asset),
+# asset_latency - dodatkowe sekundy odpowiedzi /asset dla wybranych zdjęć: nasa_id -> sekundy
+class FakeApi:
+    def __init__(self, port=0, latency=0.0, bandwidth=0, error_rate=0.0, error_status=503,
+                 total_hits=TOTAL_HITS, fixtures=None, seed=0, missing_orig=0.0, opaque_thumbs=False, asset_latency=None):
+        self.latency = latency
+        self.asset_latency = asset_latency or {}
+        self.opaque_thumbs = opaque_thumbs
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.missing_orig = missing_orig
+        self.total_hits = total_hits
+        if fixtures:
+            self.thumbs = self.origs = load_fixtures(fixtures)
+        else:
+            self.thumbs = generate_images(THUMB_SIZE)
+            self.origs = generate_images(ORIG_SIZE)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset_stats()
+        self.server = Server(('127.0.0.1', port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # Liczniki: zapytania według rodzaju, wysłane bajty, wstrzyknięte błędy, odpowiedzi 304
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {'requests': 0, 'search': 0, 'asset': 0, 'image': 0, 'bytes': 0, 'errors': 0, 'not_modified': 0}
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def _inject_error(self):
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    # Odpowiedź na wyszukiwanie w formacie collection+json z linkiem "next"
+    def search(self, params):
+        query = params.get('q', [''])[0]
+        page = int(params.get('page', ['1'])[0])
+        page_size = int(params.get('page_size', [str(PAGE_SIZE)])[0])
+        first = (page - 1) * page_size
+        last = min(self.total_hits, first + page_size)
+        prefix = hashlib.sha1(query.encode('utf-8')).hexdigest()[:6].upper()  # Inne zapytanie - inne zdjęcia
+        items = []
+        for i in range(first, last):
+            nasa_id = f"{prefix}{i:05d}"
+            thumb = f"{nasa_id}_preview.jpg" if self.opaque_thumbs else f"{nasa_id}~small.jpg"
+            items.append({
+                'href': f"{self.base_url}/asset/{nasa_id}",
+                'data': [{
+                    'nasa_id': nasa_id,
+                    'title': f"{query} {i}",
+                    'description': f"Fake result {i} for {query}",
+                    'keywords': [query, f"k{i % 10}"],
+                    'date_created': f"20{i % 25:02d}-01-01T00:00:00Z",
+                    'media_type': 'image',
+                }],
+                'links': [{'href': f"{self.base_url}/image/{nasa_id}/{thumb}", 'rel': 'preview', 'render': 'image'}],
+            })
+        links = []
+        if last < self.total_hits:
+            next_params = {k: v[0] for k, v in params.items()}
+            next_params['page'] = str(page + 1)
+            links.append({'rel': 'next', 'prompt': 'Next', 'href': f"{self.base_url}/search?{urlencode(next_params)}"})
+        return {'collection': {'items': items, 'links': links, 'metadata': {'total_hits': self.total_hits}}}
+
+    # Czy zdjęcie nie ma pliku ~orig.jpg (zawsze to samo dla danego nasa_id)
+    def is_missing_orig(self, nasa_id):
+        return int(hashlib.sha1(nasa_id.encode('utf-8')).hexdigest(), 16) % 1000 < self.missing_orig * 1000
+
+    # Lista plików zdjęcia
+    def asset(self, nasa_id):
+        base = f"{self.base_url}/image/{nasa_id}/{nasa_id}"
+        names = ('~orig.jpg', '~large.jpg', '~medium.jpg', '~small.jpg', '~thumb.jpg')
+        if self.is_missing_orig(nasa_id):
+            names = names[1:]
+        return {'collection': {'items': [{'href': base + name} for name in names] + [{'href': f"{base}/metadata.json"}]}}
+
+    # Bajty zdjęcia - zawsze te same dla danej nazwy pliku
+    def image(self, name):
+        images = self.thumbs if name.endswith(('~thumb.jpg', '~small.jpg', '_preview.jpg')) else self.origs
+        index = int(hashlib.sha1(name.encode('utf-8')).hexdigest(), 16) % len(images)
+        return images[index]
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Połączenia utrzymywane między zapytaniami
+
+            def do_HEAD(self):
+                self.do_GET(head=True)
+
+            def do_GET(self, head=False):
+                self.head = head  # Odpowiedź bez treści
+                api._count('requests')
+                if api.latency:
+                    time.sleep(api.latency)
+                url = urlsplit(self.path)
+                parts = url.path.strip('/').split('/')
+                if api._inject_error():
+                    api._count('errors')
+                    return self.send(api.error_status, b'', 'text/plain')
+                if parts[0] == 'search':
+                    api._count('search')
+                    body = json.dumps(api.search(parse_qs(url.query))).encode('utf-8')
+                    etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+                    if self.headers.get('If-None-Match') == etag:
+                        api._count('not_modified')
+                        return self.send(304, b'', None, {'ETag': etag})
+                    return self.send(200, body, 'application/json', {'ETag': etag})
+                if parts[0] == 'asset' and len(parts) == 2:
+                    api._count('asset')
+                    if parts[1] in api.asset_latency:
+                        time.sleep(api.asset_latency[parts[1]])
+                    return self.send(200, json.dumps(api.asset(parts[1])).encode('utf-8'), 'application/json')
+                if parts[0] == 'image' and len(parts) == 3 and parts[2].endswith('.jpg'):
+                    if parts[2].endswith('~orig.jpg') and api.is_missing_orig(parts[1]):
+                        return self.send(404, b'', 'text/plain')
+                    api._count('image')
+                    return self.send(200, api.image(parts[2]), 'image/jpeg')
+                return self.send(404, b'', 'text/plain')
+
+            # Wysłanie odpowiedzi (porcjami, jeśli przepustowość jest ograniczona)
+            def send(self, status, body, content_type, headers=None):
+                self.send_response(status)
+                if content_type:
+                    self.send_header('Content-Type', content_type)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.head:
+                    return
+                if not api.bandwidth:
+                    self.wfile.write(body)
+                else:
+                    for start in range(0, len(body), CHUNK):
+                        chunk = body[start:start + CHUNK]
+                        self.wfile.write(chunk)
+                        time.sleep(len(chunk) / api.bandwidth)
+                api._count('bytes', len(body))
+
+            def log_message(self, *args):
+                pass  # Bez wpisów w konsoli przy każdym zapytaniu
+
+        return Handler
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lokalny zamiennik images-api.nasa.gov")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help="opóźnienie każdej odpowiedzi (s)")
+    parser.add_argument('--bandwidth', type=int, default=0, help="przepustowość na połączenie (B/s, 0 = bez limitu)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="odsetek odpowiedzi z błędem (0-1)")
+    parser.add_argument('--error-status', type=int, default=503, help="kod wstrzykiwanych błędów")
+    parser.add_argument('--total-hits', type=int, default=TOTAL_HITS, help="liczba wyników wyszukiwania")
+    parser.add_argument('--fixtures', help="katalog z plikami JPG")
+    parser.add_argument('--missing-orig', type=float, default=0.0, help="odsetek zdjęć bez pliku ~orig.jpg (0-1)")
+    parser.add_argument('--opaque-thumbs', action='store_true', help="podglądy bez końcówki ~small.jpg (zapytania /asset)")
+    args = parser.parse_args(argv)
+    api = FakeApi(args.port, args.latency, args.bandwidth, args.error_rate, args.error_status,
+                  args.total_hits, args.fixtures, missing_orig=args.missing_orig, opaque_thumbs=args.opaque_thumbs)
+    print(f"Serwer: {api.base_url}/search?media_type=image  (zasoby: {api.base_url}/asset/)", file=sys.stderr)
+    try:
+        api.server.serve_forever()
+    except KeyboardInterrupt:
+        api.server.server_close()
+
+if __name__ == '__main__':
+    main()
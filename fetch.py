@@ -1,111 +1,179 @@
-import requests
-import tkinter as tk
-from tkinter import ttk
-from PIL import Image, ImageTk
-from io import BytesIO
-
-# Funkcja pobierająca zdjęcia ze strony
-def Fetch_Nasa_Images(query):  
-    url = "https://images-api.nasa.gov/search"  # link do strony
-    params_q = {'q': query}  # Ustala parametry
-    response = requests.get(url, params=params_q)
-    if response.status_code == 200:  # Sprawdza, czy odpowiedź była poprawna
-        return response.json()
-    else:
-        raise Exception(f'Nie udało się pobrać danych, kod błędu {response.status_code}')  # Informacja w wypadku błędu
+import http_client
+import image_pipeline
+import nasa_api
+import metrics
+import queue
+from itertools import islice
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
+
+NUM_IMAGES = 18  # Liczba wyświetlanych zdjęć
+
+# Funkcja pobierająca zdjęcia ze strony - zwraca kolejne wyniki (pobierane dopiero, gdy są potrzebne)
+def Fetch_Nasa_Images(query):
+    url = "https://images-api.nasa.gov/search?" + urlencode({'q': query})  # link do strony z parametrami
+    return nasa_api.iter_results(url)  # Błąd pobierania zgłaszany jest przy odczycie wyników
+
+POLL_MS = 50  # Co ile milisekund okno sprawdza wyniki z wątków
+executor = ThreadPoolExecutor(max_workers=6)  # Wątki pobierające i dekodujące zdjęcia
+results = queue.Queue()  # Wyniki z wątków dla okna (Tkinter działa tylko w głównym wątku)
+current_batch = 0  # Numer bieżącego wyszukiwania - wyniki starszych są pomijane
+current_click = 0  # Numer ostatniego kliknięcia - liczy się tylko najnowsze
+# Okno i jego elementy (tworzone w main) - import modułu nie otwiera okna ani nie ładuje Tkinter
+tk = None
+ImageTk = None
+root = entry = result_label = frame = image_display_area = None
 
  # Funkcja wyświetlająca powiększony obraz po kliknięciu
-def Image_Click(img_data): 
+def Image_Click(img_data, href):
+    global current_click
+    current_click += 1
+    executor.submit(decode_full, current_click, img_data, href)  # Dekodowanie w tle
+
+# Dekodowanie powiększonego zdjęcia (w wątku)
+def decode_full(click, img_data, href):
+    with metrics.span('decode'):
+        img = image_pipeline.thumbnail(img_data, (600, 600), key=href)  # Zmienia rozmiar zdjęcia na 600x600
+    results.put(('full', click, img))
+
+# Pokazanie powiększonego zdjęcia (w głównym wątku)
+def show_full(img):
     for widget in image_display_area.winfo_children():  # Czyści miejsce dla obrazu
         widget.destroy()
 
-    img = Image.open(BytesIO(img_data))
-    img.thumbnail((600, 600))  # Zmienia rozmiar zdjęcia na 600x600
     img_tk = ImageTk.PhotoImage(img)  # Konwertuje zdjęcie na format Tkinter
     lbl = tk.Label(image_display_area, image=img_tk, bg='black')  # Tworzy etykietę
     lbl.image = img_tk  # Zachowuje referencję do obrazu
     lbl.pack()
 
-# Funkcja do wyświetlania zdjęć
-def display_images(query):
+# Wyszukiwanie (w wątku) - zleca pobranie każdej miniaturki osobno
+def search_job(batch, query):
     try:
-        result_label.config(text="")  # Usuwa ewentualny tekst o braku wyników
-        data = Fetch_Nasa_Images(query)  # Pobiera dane ze strony NASA
-        items = data.get('collection', {}).get('items', [])  # Odczytuje wyniki wyszukiwania
+        records = list(islice(Fetch_Nasa_Images(query), NUM_IMAGES))  # Pierwsze znalezione zdjęcia
+    except Exception as e:
+        results.put(('error', batch, e))
+        return
 
-        # Komunikat w wypadku braku wyników
-        if not items: 
-            result_label.config(text="Brak wyników wyszukiwania")
-            return
+    # Komunikat w wypadku braku wyników
+    if not records:
+        results.put(('empty', batch))
+        return
 
-        # Czyści miejsce dla nowych wyników
-        for widget in frame.winfo_children():
-            widget.destroy()
-
-        # Przetwarza pierwsze znalezione 18 zdjęć
-        for idx, item in enumerate(items[:18]):
-            item_data = item.get('data', [])
-            title = item_data[0].get("title")  # Pobiera tytuł zdjęcia
-
-            links = item.get('links', [])  # Pobiera linki do zdjęć
-
-            # Sprawdza czy istnieje link
-            if links:
-                href = links[0].get('href', '')  # Pobiera URL zdjęcia
-                if href:  # Sprawdza czy URL jest dostępny
-                    response = requests.get(href)  # Pobiera dane zdjęcia
-                    if "image" in response.headers.get("Content-Type", ""):  # Sprawdza, czy plik jest zdjęciem
-                        img_data = response.content  # Pobiera dane zdjęcia
-                        img = Image.open(BytesIO(img_data)) 
-                        img.thumbnail((180, 180))  # Zmienia rozmiar zdjęcia na 180x180
-                        img_tk = ImageTk.PhotoImage(img)  # Konwertuje zdjęcie na format Tkinter
-                    else:
-                        continue
-                    img_tk = ImageTk.PhotoImage(img)  # Ponownie przypisuje zdjęcie do zmiennej
-
-                    img_frame = tk.Frame(frame, bg='black')  # Tworzy obramówkę dla zdjęcia
-                    img_frame.grid(row=idx // 6, column=idx % 6, padx=10, pady=10)  # Układa zdjęcia
-
-                    panel = tk.Label(img_frame, image=img_tk, bg='black', cursor="hand2")  # Tworzy etykietę
-                    panel.image = img_tk  # Zachowuje referencję do zdjęcia
-                    panel.pack()  # Dodaje etykietę
-                    panel.bind("<Button-1>", lambda e, d=img_data: Image_Click(d))  # Dodaje możliwość powiększania zdjęcia po kliknięciu
-
-                    title_label = tk.Label(img_frame, text=title, fg='lime green', bg='black', wraplength=180, font=('Courier', 10))  # Tworzy etykietę z tytułem
-                    title_label.pack()  # Dodaje etykietę
-
-    # Jeżeli wystąpi błąd wyświetla komunikat
-    except Exception as e:
-        result_label.config(text=f"Wystąpił błąd: {e}")
+    results.put(('clear', batch))  # Czyści miejsce dla nowych wyników
 
-# Funkcja obsługująca wyszukiwanie obrazów dla podanej frazy
-def search():
-    query = entry.get()  # Pobiera tekst
-    if query:  # Sprawdza czy tekst został podany
-        display_images(query)  # Wywołuje funkcję do wyświetlania zdjęć
+    for idx, record in enumerate(records):
+        if batch != current_batch:
+            return  # Rozpoczęto nowe wyszukiwanie
+        executor.submit(load_tile, batch, idx, record['title'], record['thumb_url'])
 
-root = tk.Tk()  # Tworzy okno dla aplikacji
-root.title("NASA Images")  # Zmienia tytuł aplikacji
-root.configure(bg='black')  # Ustawia kolor tła
+# Pobranie i zmniejszenie jednej miniaturki (w wątku)
+def load_tile(batch, idx, title, href):
+    if batch != current_batch:
+        return  # Wyniki starego wyszukiwania nie są już potrzebne
+    try:
+        with metrics.span('thumb_download'):
+            response = http_client.get(href)  # Pobiera dane zdjęcia
+        if "image" not in response.headers.get("Content-Type", ""):  # Sprawdza, czy plik jest zdjęciem
+            return
+        img_data = response.content  # Pobiera dane zdjęcia
+        with metrics.span('decode'):  # Dekodowanie i skalowanie to tu jeden krok
+            img = image_pipeline.thumbnail(img_data, (180, 180), key=href)  # Dekoduje od razu w rozmiarze około 180x180
+    except Exception as e:
+        print("Nie udało się wczytać miniaturki:", e)
+        return
+    results.put(('tile', batch, idx, title, img, img_data, href))
+
+# Dodanie gotowej miniaturki do siatki (w głównym wątku)
+def add_tile(idx, title, img, img_data, href):
+    img_tk = ImageTk.PhotoImage(img)  # Konwertuje zdjęcie na format Tkinter
 
-# Modyfikacje graficzne dla pola wyszukiwania
-entry = tk.Entry(root, width=50, bg='light gray', fg='green')
-entry.pack(pady=10)
+    img_frame = tk.Frame(frame, bg='black')  # Tworzy obramówkę dla zdjęcia
+    img_frame.grid(row=idx // 6, column=idx % 6, padx=10, pady=10)  # Układa zdjęcia
 
-# Modyfikacje graficzne dla przycisku wyszukiwania
-search_button = tk.Button(root, text="Szukaj", command=search, bg='light gray', fg='green')
-search_button.pack() 
+    panel = tk.Label(img_frame, image=img_tk, bg='black', cursor="hand2")  # Tworzy etykietę
+    panel.image = img_tk  # Zachowuje referencję do zdjęcia
+    panel.pack()  # Dodaje etykietę
+    panel.bind("<Button-1>", lambda e, d=img_data, h=href: Image_Click(d, h))  # Dodaje możliwość powiększania zdjęcia po kliknięciu
 
-# Modyfikacje graficzne etykiet
-result_label = tk.Label(root, text="", fg='red', bg='black')
-result_label.pack()
+    title_label = tk.Label(img_frame, text=title, fg='lime green', bg='black', wraplength=180, font=('Courier', 10))  # Tworzy etykietę z tytułem
+    title_label.pack()  # Dodaje etykietę
 
-# Grupuje elementy wyszukiwania
-frame = tk.Frame(root, bg='black')
-frame.pack()
+# Odbiór wyników z wątków - wywoływane cyklicznie przez root.after
+def poll_results():
+    try:
+        while True:
+            message = results.get_nowait()
+            kind = message[0]
+            if kind == 'full':
+                if message[1] == current_click:
+                    show_full(message[2])
+                continue
+            if message[1] != current_batch:
+                continue  # Wynik starego wyszukiwania
+            if kind == 'tile':
+                add_tile(*message[2:])
+            elif kind == 'clear':
+                for widget in frame.winfo_children():
+                    widget.destroy()
+            elif kind == 'empty':
+                result_label.config(text="Brak wyników wyszukiwania")
+            elif kind == 'error':
+                # Jeżeli wystąpi błąd wyświetla komunikat
+                result_label.config(text=f"Wystąpił błąd: {message[2]}")
+    except queue.Empty:
+        pass
+    root.after(POLL_MS, poll_results)
+
+# Funkcja do wyświetlania zdjęć - nie blokuje okna, wyniki pojawiają się stopniowo
+def display_images(query):
+    global current_batch
+    current_batch += 1  # Anuluje poprzednie wyszukiwanie
+    result_label.config(text="")  # Usuwa ewentualny tekst o braku wyników
+    executor.submit(search_job, current_batch, query)
 
-# Tworzy miejsce do wyświetlania klikniętych zdjęć
-image_display_area = tk.Frame(root, bg='black')
-image_display_area.pack(pady=20)
+# Funkcja obsługująca wyszukiwanie obrazów dla podanej frazy
+def search():
+    query = entry.get()  # Pobiera tekst
+    if query:  # Sprawdza czy tekst został podany
+        display_images(query)  # Wywołuje funkcję do wyświetlania zdjęć
 
-root.mainloop()  # Sprawia że aplikacja może działać dopóki użytkownik nie zamknie okna
+# Zbudowanie okna i uruchomienie aplikacji
+def main():
+    global tk, ImageTk, root, entry, result_label, frame, image_display_area
+    import tkinter as tk  # Tkinter i PIL.ImageTk ładowane dopiero przy otwieraniu okna
+    from PIL import ImageTk
+
+    root = tk.Tk()  # Tworzy okno dla aplikacji
+    root.title("NASA Images")  # Zmienia tytuł aplikacji
+    root.configure(bg='black')  # Ustawia kolor tła
+
+    # Modyfikacje graficzne dla pola wyszukiwania
+    entry = tk.Entry(root, width=50, bg='light gray', fg='green')
+    entry.pack(pady=10)
+
+    # Modyfikacje graficzne dla przycisku wyszukiwania
+    search_button = tk.Button(root, text="Szukaj", command=search, bg='light gray', fg='green')
+    search_button.pack()
+
+    # Modyfikacje graficzne etykiet
+    result_label = tk.Label(root, text="", fg='red', bg='black')
+    result_label.pack()
+
+    # Grupuje elementy wyszukiwania
+    frame = tk.Frame(root, bg='black')
+    frame.pack()
+
+    # Tworzy miejsce do wyświetlania klikniętych zdjęć
+    image_display_area = tk.Frame(root, bg='black')
+    image_display_area.pack(pady=20)
+
+    http_client.prepare()  # Biblioteka HTTP ładuje się w tle, gdy użytkownik wpisuje frazę
+    root.after(POLL_MS, poll_results)  # Odbieranie wyników z wątków
+    root.mainloop()  # Sprawia że aplikacja może działać dopóki użytkownik nie zamknie okna
+    print("Czasy etapów:", metrics.get_registry().to_json())  # p50/p95 wyszukiwania, pobierania i dekodowania
+    if http_client.archive_stats() is not None:
+        print("Archiwum HTTP:", http_client.archive_stats())  # Nagrane albo odtworzone odpowiedzi
+
+# Uruchomienie programu
+if __name__ == '__main__':
+    main()
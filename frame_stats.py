@@ -0,0 +1,27 @@
+# Histogram czasów klatek - pokazuje, czy pętla utrzymuje docelowe FPS
+BUCKETS_MS = (17, 34, 50, 100, 250) # Górne granice przedziałów (ms)
+
+class FrameHistogram:
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # Ostatni przedział: powyżej największej granicy
+        self.frames = 0
+        self.worst_ms = 0
+
+    # Dodanie czasu jednej klatki (np. wartość zwrócona przez clock.tick)
+    def add(self, ms):
+        self.frames += 1
+        self.worst_ms = max(self.worst_ms, ms)
+        for i, limit in enumerate(self.buckets):
+            if ms <= limit:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    # Słownik przedział -> liczba klatek
+    def summary(self):
+        labels = [f"<={limit}ms" for limit in self.buckets] + [f">{self.buckets[-1]}ms"]
+        result = dict(zip(labels, self.counts))
+        result['frames'] = self.frames
+        result['worst_ms'] = self.worst_ms
+        return result
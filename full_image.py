@@ -0,0 +1,64 @@
+import threading
+import pygame
+import redraw
+
+PROGRESS_COLOR = (80, 160, 255) # Kolor paska postępu
+PROGRESS_HEIGHT = 6 # Wysokość paska postępu
+
+# Wymiary obrazu dopasowanego do obszaru z zachowaniem proporcji
+def fit_size(size, bounds):
+    w, h = size
+    scale = min(bounds[0] / w, bounds[1] / h)
+    return (max(1, int(w * scale)), max(1, int(h * scale)))
+
+# Otwieranie pełnego zdjęcia w tle
+# Od razu pokazuje powiększoną miniaturkę, a po zdekodowaniu podmienia ją na pełne zdjęcie
+# load(on_progress, cancelled) wykonuje się w osobnym wątku i zwraca gotową powierzchnię albo None
+class FullImageJob:
+    def __init__(self, preview, screen_size, load):
+        self.surface = pygame.transform.scale(preview, fit_size(preview.get_size(), screen_size)) # Podgląd
+        self.received = 0 # Pobrane bajty
+        self.total = None # Rozmiar pliku (jeśli serwer go podał)
+        self.done = False # Pełne zdjęcie gotowe
+        self.failed = False # Nie udało się wczytać zdjęcia
+        self.cancelled = False # Przerwane przez użytkownika
+        threading.Thread(target=self._run, args=(load,), daemon=True).start()
+
+    def _run(self, load):
+        try:
+            surface = load(self._on_progress, self.is_cancelled)
+        except Exception as e:
+            print("Błąd przy wczytywaniu zdjęcia:", e)
+            surface = None
+        if self.cancelled:
+            return
+        if surface is None:
+            self.failed = True
+        else:
+            self.surface = surface # Podmiana podglądu na pełne zdjęcie
+            self.done = True
+        redraw.notify()  # Pętla mogła przestać rysować klatki - budzimy ją
+
+    def _on_progress(self, received, total):
+        self.received = received
+        self.total = total
+
+    def is_cancelled(self):
+        return self.cancelled
+
+    # Przerwanie pobierania (np. ESC)
+    def cancel(self):
+        self.cancelled = True
+
+    # Pasek postępu na dole ekranu (przy nieznanym rozmiarze - przesuwający się fragment)
+    def draw_progress(self, screen):
+        if self.done or self.failed:
+            return
+        sw, sh = screen.get_size()
+        if self.total:
+            width = int(sw * min(1.0, self.received / self.total))
+            rect = pygame.Rect(0, sh - PROGRESS_HEIGHT, width, PROGRESS_HEIGHT)
+        else:
+            x = (pygame.time.get_ticks() // 4) % sw
+            rect = pygame.Rect(x, sh - PROGRESS_HEIGHT, sw // 5, PROGRESS_HEIGHT)
+        pygame.draw.rect(screen, PROGRESS_COLOR, rect)
@@ -0,0 +1,93 @@
+import json
+import zlib
+import sqlite3
+import threading
+from requests.structures import CaseInsensitiveDict
+
+COMPRESSED_TYPES = ('json', 'text', 'xml') # Typy treści zapisywane po kompresji (JPEG i PNG są już skompresowane)
+SKIPPED_HEADERS = ('content-encoding', 'transfer-encoding', 'connection', 'keep-alive') # Treść zapisujemy rozpakowaną
+ARCHIVE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+)
+
+# Archiwum odpowiedzi HTTP w jednym pliku SQLite: wyniki wyszukiwania, dane /asset i bajty zdjęć
+# Jedna odpowiedź na (metoda, adres) - nowsze nagrania zastępują starsze
+class HttpArchive:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.hits = 0 # Odpowiedzi odtworzone z archiwum
+        self.misses = 0 # Zapytania, których nie ma w archiwum
+        self.bytes = 0 # Bajty odtworzonych treści
+        self.saved = 0 # Zapisane odpowiedzi
+        with self.lock:
+            for pragma in ARCHIVE_PRAGMAS:
+                self.conn.execute(pragma)
+            self.conn.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS responses (
+                    method TEXT,        -- GET albo HEAD
+                    url TEXT,           -- pełny adres z parametrami
+                    status INTEGER,     -- kod odpowiedzi
+                    reason TEXT,        -- opis kodu (np. OK)
+                    headers TEXT,       -- nagłówki jako JSON
+                    body BLOB,          -- treść (rozpakowana z gzip)
+                    compressed INTEGER, -- czy body jest skompresowane zlib
+                    PRIMARY KEY (method, url)
+                ) WITHOUT ROWID
+                '''
+            )
+            self.conn.commit()
+
+    # Zapis odpowiedzi (treść już odczytana)
+    def save(self, method, url, status, reason, headers, body):
+        # Nazwy nagłówków bez względu na wielkość liter (serwer może wysłać np. content-type)
+        headers = CaseInsensitiveDict({name: value for name, value in headers.items() if name.lower() not in SKIPPED_HEADERS})
+        compressed = any(kind in headers.get('Content-Type', '') for kind in COMPRESSED_TYPES)
+        if 'Content-Length' in headers:
+            headers['Content-Length'] = str(len(body))
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO responses(method,url,status,reason,headers,body,compressed) VALUES (?,?,?,?,?,?,?)',
+                (method, url, status, reason, json.dumps(dict(headers)), zlib.compress(body) if compressed else body, compressed)
+            )
+            self.conn.commit()
+            self.saved += 1
+
+    # Odpowiedź (status, reason, nagłówki, treść) albo None, jeśli jej nie nagrano
+    # Zapytanie HEAD bez własnego nagrania dostaje nagłówki odpowiedzi GET
+    def load(self, method, url):
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT status, reason, headers, body, compressed FROM responses WHERE url=? AND method IN (?, ?) '
+                'ORDER BY method=? DESC LIMIT 1',
+                (url, method, 'GET' if method == 'HEAD' else method, method)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            status, reason, headers, body, compressed = row
+            body = zlib.decompress(body) if compressed else bytes(body)
+            if method == 'HEAD':
+                body = b''
+            self.hits += 1
+            self.bytes += len(body)
+        return status, reason, json.loads(headers), body
+
+    def reset_stats(self):
+        with self.lock:
+            self.hits = self.misses = self.bytes = self.saved = 0
+
+    def stats(self):
+        with self.lock:
+            entries, size = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM responses').fetchone()
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'bytes': self.bytes,
+                'saved': self.saved,
+                'entries': entries,
+                'stored_bytes': size,
+            }
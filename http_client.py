@@ -0,0 +1,321 @@
+import io
+import os
+import socket
+import time
+import threading
+from collections import deque
+from urllib.parse import urlparse
+import single_flight
+
+DEFAULT_TIMEOUT = 10 # Domyślny limit czasu zapytania (w sekundach)
+# Rozmiar puli połączeń dla każdego serwera NASA
+POOL_SIZES = {
+    "images-api.nasa.gov": 8,      # wyszukiwanie i zapytania o pliki
+    "images-assets.nasa.gov": 16,  # miniaturki i pełne zdjęcia
+}
+DEFAULT_POOL_SIZE = 4 # Pula dla pozostałych serwerów
+RETRIES = 3 # Liczba ponowień
+BACKOFF = 0.5 # Podstawa odstępu między ponowieniami (0.5 s, 1 s, 2 s...)
+RETRY_STATUSES = (429, 500, 502, 503, 504) # Kody, przy których ponawiamy
+TIMINGS_KEPT = 1000 # Ile ostatnich pomiarów przechowujemy
+# Nagrywanie i odtwarzanie odpowiedzi (powtarzalne pomiary, maszyny bez internetu) - działa w każdym programie:
+#   NASA_HTTP_ARCHIVE=nasa.archive NASA_HTTP_MODE=record python nasa_baza.py   (zwykła sesja, odpowiedzi trafiają do pliku)
+#   NASA_HTTP_ARCHIVE=nasa.archive NASA_HTTP_LATENCY=0.05 python fetch.py      (tylko z pliku, z opóźnieniem 50 ms)
+ARCHIVE_FILE = os.environ.get('NASA_HTTP_ARCHIVE') or None # Plik archiwum (None - zwykła sieć)
+ARCHIVE_MODE = os.environ.get('NASA_HTTP_MODE', 'replay') # 'record' - sieć z zapisem, 'replay' - tylko archiwum
+ARCHIVE_LATENCY = float(os.environ.get('NASA_HTTP_LATENCY', 0)) # Opóźnienie odtwarzanej odpowiedzi (w sekundach)
+
+# Równoczesne zapytania o ten sam adres korzystają z jednego pobierania (liczniki w coalescing_stats)
+_flights = single_flight.SingleFlight(lambda result: len(result) if isinstance(result, bytes) else len(result.content))
+_timing = threading.local() # Pomiary bieżącego zapytania (osobne dla każdego wątku)
+timings = deque(maxlen=TIMINGS_KEPT) # Ostatnie pomiary: host, dns, connect, tls, ttfb, body, bytes, status
+_timings_lock = threading.Lock()
+
+# Dopisanie czasu do pomiaru bieżącego zapytania
+def _add_timing(name, seconds):
+    current = getattr(_timing, 'current', None)
+    if current is not None:
+        current[name] = current.get(name, 0.0) + seconds
+
+# Adapter z pulą połączeń, ponowieniami i pomiarem czasu: DNS, nawiązywanie połączenia TCP oraz TLS
+# Tworzony przy pierwszej sesji - import requests i urllib3 trwa dłużej niż start okna
+def _timed_adapter_class():
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+    from urllib3.exceptions import NewConnectionError, ConnectTimeoutError
+
+    class TimedConnectionMixin:
+        # Najpierw osobno mierzone DNS, potem łączenie z kolejnymi adresami (jak create_connection)
+        def _new_conn(self):
+            host = self._dns_host
+            start = time.perf_counter()
+            try:
+                infos = socket.getaddrinfo(host, self.port, 0, socket.SOCK_STREAM)
+            except socket.gaierror:
+                return super()._new_conn()  # Błąd nazwy zgłosi urllib3 (NameResolutionError)
+            _add_timing('dns', time.perf_counter() - start)
+            addresses = list(dict.fromkeys(info[4][0] for info in infos))
+            start = time.perf_counter()
+            try:
+                for i, address in enumerate(addresses):
+                    self._dns_host = address  # Adres IP - create_connection nie pyta już DNS
+                    try:
+                        sock = super()._new_conn()
+                        break
+                    except (OSError, NewConnectionError, ConnectTimeoutError):  # urllib3 2.x opakowuje błędy gniazda
+                        if i == len(addresses) - 1:
+                            raise
+            finally:
+                self._dns_host = host
+            _add_timing('connect', time.perf_counter() - start)
+            return sock
+
+        def connect(self):
+            start = time.perf_counter()
+            current = getattr(_timing, 'current', None)
+            before = current.get('dns', 0.0) + current.get('connect', 0.0) if current is not None else 0.0
+            super().connect()
+            if current is not None:
+                # Czas TLS to całe łączenie minus DNS i samo gniazdo
+                socket_time = current.get('dns', 0.0) + current.get('connect', 0.0) - before
+                _add_timing('tls', max(0.0, time.perf_counter() - start - socket_time))
+
+    class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+        pass
+
+    class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+        pass
+
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = TimedHTTPConnection
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = TimedHTTPSConnection
+
+    class TimedAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                'http': TimedHTTPConnectionPool,
+                'https': TimedHTTPSConnectionPool,
+            }
+
+    return TimedAdapter
+
+# Adapter zapisujący w archiwum każdą odpowiedź (poza 304 - archiwum ma zawierać pełną treść)
+# Treść jest odczytywana od razu, więc przy nagrywaniu pobieranie porcjami nie pokazuje postępu na bieżąco
+def _recording_adapter_class(base, archive):
+    class RecordingAdapter(base):
+        def send(self, request, **kwargs):
+            response = super().send(request, **kwargs)
+            if response.status_code != 304:
+                archive.save(request.method, request.url, response.status_code, response.reason, response.headers, response.content)
+            return response
+
+    return RecordingAdapter
+
+# Adapter odpowiadający wyłącznie z archiwum; brak nagrania to błąd połączenia (jak bez sieci)
+def _replay_adapter_class():
+    import requests
+    from requests.adapters import BaseAdapter
+    from requests.structures import CaseInsensitiveDict
+
+    class ReplayAdapter(BaseAdapter):
+        def __init__(self, archive, latency):
+            super().__init__()
+            self.archive = archive
+            self.latency = latency
+
+        def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+            if self.latency:
+                time.sleep(self.latency)  # Symulowane opóźnienie serwera
+            entry = self.archive.load(request.method, request.url)
+            if entry is None:
+                raise requests.ConnectionError(f"Brak odpowiedzi w archiwum: {request.method} {request.url}", request=request)
+            status, reason, headers, body = entry
+            response = requests.Response()
+            response.status_code = status
+            response.reason = reason
+            response.headers = CaseInsensitiveDict(headers)
+            response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+            response.url = request.url
+            response.request = request
+            response.connection = self
+            response.raw = io.BytesIO(body)
+            response._content = body
+            response._content_consumed = True  # iter_content zwraca porcje zapisanej treści
+            return response
+
+        def close(self):
+            pass
+
+    return ReplayAdapter
+
+# Tworzy sesję z osobną pulą połączeń dla każdego serwera (albo sesję odtwarzającą archiwum)
+def make_session():
+    import requests
+    from urllib3.util.retry import Retry
+    global _archive
+    TimedAdapter = _timed_adapter_class()
+    session = requests.Session()
+    session.headers['Accept-Encoding'] = 'gzip, deflate'
+    if ARCHIVE_FILE:
+        import http_archive  # SQLite tylko przy nagrywaniu lub odtwarzaniu
+        _archive = http_archive.HttpArchive(ARCHIVE_FILE)
+        if ARCHIVE_MODE == 'replay':
+            replay = _replay_adapter_class()(_archive, ARCHIVE_LATENCY)
+            session.mount('http://', replay)
+            session.mount('https://', replay)
+            return session
+        TimedAdapter = _recording_adapter_class(TimedAdapter, _archive)
+    retry = Retry(
+        total=RETRIES,
+        backoff_factor=BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=('GET', 'HEAD'),
+        respect_retry_after_header=True,
+    )
+    default = TimedAdapter(pool_connections=4, pool_maxsize=DEFAULT_POOL_SIZE, max_retries=retry)
+    session.mount('http://', default)
+    session.mount('https://', default)
+    for host, size in POOL_SIZES.items():
+        adapter = TimedAdapter(pool_connections=1, pool_maxsize=size, max_retries=retry)
+        session.mount(f'http://{host}', adapter)
+        session.mount(f'https://{host}', adapter)
+    return session
+
+_session = None # Wspólna sesja dla całego programu
+_session_lock = threading.Lock()
+_archive = None # Archiwum odpowiedzi (gdy ustawiono ARCHIVE_FILE)
+
+# Nagrywanie (mode='record') lub odtwarzanie (mode='replay') archiwum path; None - zwykła sieć
+# Działa od następnego zapytania (sesja jest tworzona od nowa)
+def use_archive(path, mode='replay', latency=0.0):
+    global ARCHIVE_FILE, ARCHIVE_MODE, ARCHIVE_LATENCY, _session, _archive
+    with _session_lock:
+        ARCHIVE_FILE, ARCHIVE_MODE, ARCHIVE_LATENCY = path, mode, latency
+        _session = None
+        _archive = None
+
+# Liczniki archiwum (odtworzone, brakujące, zapisane odpowiedzi) albo None bez archiwum
+def archive_stats():
+    return _archive.stats() if _archive is not None else None
+
+def reset_archive_stats():
+    if _archive is not None:
+        _archive.reset_stats()
+
+# Zwraca wspólną sesję (tworzona przy pierwszym użyciu)
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+# Utworzenie sesji w tle (np. gdy użytkownik wpisuje zapytanie) - pierwsze zapytanie nie czeka na import requests
+def prepare():
+    threading.Thread(target=get_session, daemon=True, name="http-prepare").start()
+
+# Zapis pomiaru zakończonego zapytania
+def _record(url, current, start, headers_at, end, nbytes, status):
+    record = {
+        'host': urlparse(url).hostname,
+        'dns': current.get('dns', 0.0),
+        'connect': current.get('connect', 0.0),
+        'tls': current.get('tls', 0.0),
+        'ttfb': headers_at - start,
+        'body': end - headers_at,
+        'bytes': nbytes,
+        'status': status,
+    }
+    with _timings_lock:
+        timings.append(record)
+
+# Zapytanie GET przez wspólną sesję z zapisem czasów: dns, connect, tls, ttfb, body
+# Równoczesne zapytania o ten sam adres z tymi samymi nagłówkami dostają tę samą odpowiedź
+def get(url, timeout=DEFAULT_TIMEOUT, **kwargs):
+    if set(kwargs) - {'headers'}:
+        return _get(url, timeout, **kwargs)  # Inne parametry zapytania - bez łączenia
+    key = ('get', url, tuple(sorted((kwargs.get('headers') or {}).items())))
+    return _flights.do(key, lambda on_progress, cancelled: _get(url, timeout, **kwargs))
+
+def _get(url, timeout, **kwargs):
+    _timing.current = {}
+    start = time.perf_counter()
+    try:
+        response = get_session().get(url, timeout=timeout, stream=True, **kwargs)
+        headers_at = time.perf_counter()
+        response.content  # Odczyt całej treści (zapisywana w obiekcie odpowiedzi)
+        end = time.perf_counter()
+    finally:
+        current = _timing.current
+        _timing.current = None
+    _record(url, current, start, headers_at, end, len(response.content), response.status_code)
+    return response
+
+# Zapytanie HEAD (np. sprawdzenie, czy plik istnieje) przez wspólną sesję
+def head(url, timeout=DEFAULT_TIMEOUT):
+    return get_session().head(url, timeout=timeout, allow_redirects=True)
+
+# Pobranie pliku porcjami z informacją o postępie
+# on_progress(pobrane, całość) - całość może być None; cancelled() - zwraca True, gdy trzeba przerwać
+# Zwraca bajty albo None, jeśli pobieranie przerwano
+# Równoczesne pobierania tego samego adresu są łączone; rezygnacja jednego z nich nie przerywa pozostałych
+def download(url, on_progress=None, cancelled=None, timeout=DEFAULT_TIMEOUT, chunk_size=64 * 1024):
+    return _flights.do(
+        ('download', url),
+        lambda shared_progress, shared_cancelled: _download(url, shared_progress, shared_cancelled, timeout, chunk_size),
+        on_progress, cancelled
+    )
+
+def _download(url, on_progress, cancelled, timeout, chunk_size):
+    _timing.current = {}
+    start = time.perf_counter()
+    chunks = []
+    received = 0
+    try:
+        with get_session().get(url, timeout=timeout, stream=True) as response:
+            headers_at = time.perf_counter()
+            response.raise_for_status()
+            total = response.headers.get('Content-Length')
+            total = int(total) if total and 'Content-Encoding' not in response.headers else None
+            for chunk in response.iter_content(chunk_size):
+                if cancelled and cancelled():
+                    return None  # Zamknięcie odpowiedzi zwalnia połączenie
+                chunks.append(chunk)
+                received += len(chunk)
+                if on_progress:
+                    on_progress(received, total)
+        end = time.perf_counter()
+    finally:
+        current = _timing.current
+        _timing.current = None
+    _record(url, current, start, headers_at, end, received, response.status_code)
+    return b''.join(chunks)
+
+# Liczniki łączenia równoczesnych zapytań: wykonane, dołączone, zaoszczędzone bajty
+def coalescing_stats():
+    return _flights.stats()
+
+def reset_coalescing_stats():
+    _flights.reset_stats()
+
+# Podsumowanie pomiarów: liczba zapytań, nowych połączeń i średnie czasy (ms)
+def timing_summary():
+    with _timings_lock:
+        records = list(timings)
+    if not records:
+        return {'requests': 0}
+    n = len(records)
+    return {
+        'requests': n,
+        'new_connections': sum(1 for r in records if r['connect'] > 0),
+        'avg_dns_ms': 1000 * sum(r['dns'] for r in records) / n,
+        'avg_connect_ms': 1000 * sum(r['connect'] for r in records) / n,
+        'avg_tls_ms': 1000 * sum(r['tls'] for r in records) / n,
+        'avg_ttfb_ms': 1000 * sum(r['ttfb'] for r in records) / n,
+        'avg_body_ms': 1000 * sum(r['body'] for r in records) / n,
+        'bytes': sum(r['bytes'] for r in records),
+    }
@@ -0,0 +1,75 @@
+import threading
+from io import BytesIO
+from collections import OrderedDict
+
+REDUCING_GAP = 1.5 # Jak bardzo zdekodowany obraz może być większy od docelowego przed dokładnym skalowaniem
+CACHE_BYTES = 32 * 1024 * 1024 # Limit pamięci na przeskalowane obrazy
+
+# Dekodowanie JPEG od razu w zmniejszonej skali (1/2, 1/4, 1/8) i dokładne zmniejszenie do rozmiaru
+# Zwraca obraz PIL mieszczący się w size z zachowaniem proporcji
+# PIL jest importowany przy pierwszym dekodowaniu (moduł można zaimportować bez niego)
+def decode_scaled(data, size):
+    from PIL import Image
+    img = Image.open(BytesIO(data))
+    if img.format == 'JPEG':
+        # Dekoder JPEG pomija niepotrzebne współczynniki DCT - mniej pracy i pamięci
+        img.draft('RGB', (int(size[0] * REDUCING_GAP), int(size[1] * REDUCING_GAP)))
+    img.thumbnail(size, reducing_gap=REDUCING_GAP)  # Dla innych formatów: Image.reduce przed skalowaniem
+    return img
+
+# Dekodowanie całego obrazu i dopiero potem zmniejszenie (do porównań w bench.py)
+def decode_full(data, size):
+    from PIL import Image
+    img = Image.open(BytesIO(data))
+    img.load()  # Pełne dekodowanie w oryginalnej rozdzielczości
+    img.thumbnail(size, reducing_gap=None)
+    return img
+
+# Rozmiar pikseli obrazu w bajtach
+def image_bytes(img):
+    return img.width * img.height * len(img.getbands())
+
+# Pamięć podręczna przeskalowanych obrazów, klucz (źródło, rozmiar)
+class ScaledCache:
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, size):
+        with self._lock:
+            img = self.entries.get((key, size))
+            if img is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end((key, size))
+            self.hits += 1
+            return img
+
+    def put(self, key, size, img):
+        with self._lock:
+            old = self.entries.pop((key, size), None)
+            if old is not None:
+                self.bytes -= image_bytes(old)
+            self.entries[(key, size)] = img
+            self.bytes += image_bytes(img)
+            while self.bytes > self.max_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= image_bytes(evicted)
+
+_cache = ScaledCache() # Wspólna pamięć podręczna
+
+# Miniaturka o podanym rozmiarze; key (np. URL) pozwala ponownie użyć wcześniej przeskalowanego obrazu
+def thumbnail(data, size, key=None):
+    size = tuple(size)
+    if key is not None:
+        img = _cache.get(key, size)
+        if img is not None:
+            return img
+    img = decode_scaled(data, size)
+    if key is not None:
+        _cache.put(key, size, img)
+    return img
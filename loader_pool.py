@@ -0,0 +1,69 @@
+import queue
+import itertools
+import threading
+
+WORKERS = 6 # Liczba wątków ładujących miniaturki
+PRIORITY_VISIBLE = 0 # Kafelki widoczne na ekranie
+PRIORITY_PREFETCH = 1 # Kafelki pobierane z wyprzedzeniem
+
+# Pula wątków z kolejką priorytetową
+# Każde zadanie ma numer pokolenia - po zmianie strony stare zadania są pomijane
+class LoaderPool:
+    def __init__(self, workers=WORKERS):
+        self.queue = queue.PriorityQueue() # Kolejka (priorytet, kolejność, pokolenie, zadanie)
+        self.generation = 0 # Aktualne pokolenie
+        self.dropped = 0 # Liczba pominiętych nieaktualnych zadań
+        self.done = 0 # Liczba wykonanych zadań
+        self._order = itertools.count() # Zachowuje kolejność zadań o tym samym priorytecie
+        self._lock = threading.Lock()
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"loader-{i}", daemon=True).start()
+
+    # Rozpoczęcie nowego pokolenia - wszystkie wcześniejsze zadania stają się nieaktualne
+    def new_generation(self):
+        with self._lock:
+            self.generation += 1
+            return self.generation
+
+    # Sprawdza, czy zadanie z danego pokolenia jest nadal potrzebne
+    def is_current(self, generation):
+        return generation is None or generation == self.generation
+
+    # Dodanie zadania; generation=None oznacza zadanie, którego nie da się anulować
+    def submit(self, job, priority=PRIORITY_VISIBLE, generation=None):
+        self.queue.put((priority, next(self._order), generation, job))
+
+    def _worker(self):
+        while True:
+            priority, order, generation, job = self.queue.get()
+            if not self.is_current(generation):
+                with self._lock:
+                    self.dropped += 1
+                continue
+            try:
+                job()
+            except Exception as e:
+                print("Błąd zadania w puli:", e)
+            with self._lock:
+                self.done += 1
+
+    # Liczniki: długość kolejki, wykonane i pominięte zadania
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': self.queue.qsize(),
+                'done': self.done,
+                'dropped': self.dropped,
+                'generation': self.generation,
+            }
+
+_pool = None # Wspólna pula dla całego programu
+_pool_lock = threading.Lock()
+
+# Zwraca wspólną pulę (tworzona przy pierwszym użyciu)
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = LoaderPool()
+        return _pool
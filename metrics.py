@@ -0,0 +1,149 @@
+import json
+import math
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Czasy etapów programu (wyszukiwanie, pliki, cache, pobieranie, dekodowanie, skalowanie, klatka)
+# Przykład:
+#   with metrics.span('decode'):
+#       img = pygame.image.load(...)
+# Wyniki: get_registry().summary() / to_json() / to_prometheus(), na ekranie draw_overlay()
+
+SAMPLES_KEPT = 1000 # Ile ostatnich pomiarów etapu służy do wyliczenia p50/p95
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0) # Przedziały histogramu (s)
+PROMETHEUS_NAME = 'nasa_stage_seconds' # Nazwa metryki w formacie Prometheus
+# Kolejność etapów na ekranie i w raportach (inne etapy są dopisywane na końcu)
+STAGES = ('search', 'asset', 'local_search', 'cache_read', 'cache_write', 'thumb_download', 'full_download', 'decode', 'scale', 'render')
+
+# Percentyl z posortowanej listy metodą najbliższej pozycji: najmniejsza wartość, od której
+# nie jest większa co najmniej część fraction próbek (przy kilku próbkach p95 to największa z nich)
+def percentile(values, fraction):
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+# Pomiary jednego etapu: ostatnie próbki (do percentyli) i histogram od początku działania
+class Stage:
+    def __init__(self, buckets=BUCKETS):
+        self.samples = deque(maxlen=SAMPLES_KEPT)
+        self.buckets = buckets
+        self.counts = [0] * len(buckets) # Liczba pomiarów <= granicy (bez przedziału +Inf)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        for i, limit in enumerate(self.buckets):
+            if seconds <= limit:
+                self.counts[i] += 1
+
+# Rejestr pomiarów wspólny dla wszystkich wątków
+class Registry:
+    def __init__(self):
+        self.stages = {} # Nazwa etapu -> Stage
+        self._lock = threading.Lock()
+
+    # Zapis czasu etapu (w sekundach)
+    def observe(self, name, seconds):
+        with self._lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = Stage()
+            stage.add(seconds)
+
+    # Pomiar czasu bloku with; czas jest zapisywany także przy wyjątku
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    # Nazwy etapów w stałej kolejności
+    def names(self):
+        with self._lock:
+            known = [name for name in STAGES if name in self.stages]
+            return known + sorted(name for name in self.stages if name not in STAGES)
+
+    # Liczba pomiarów, p50, p95 i średnia (ms) dla każdego etapu
+    def summary(self):
+        result = {}
+        for name in self.names():
+            with self._lock:
+                stage = self.stages[name]
+                samples = sorted(stage.samples)
+                count, total = stage.count, stage.total
+            result[name] = {
+                'count': count,
+                'p50_ms': round(1000 * percentile(samples, 0.5), 3),
+                'p95_ms': round(1000 * percentile(samples, 0.95), 3),
+                'mean_ms': round(1000 * total / count, 3),
+            }
+        return result
+
+    def to_json(self):
+        return json.dumps(self.summary(), indent=2)
+
+    # Histogramy w formacie tekstowym Prometheus
+    def to_prometheus(self):
+        lines = [
+            f"# HELP {PROMETHEUS_NAME} Czas etapów przeglądarki zdjęć NASA",
+            f"# TYPE {PROMETHEUS_NAME} histogram",
+        ]
+        for name in self.names():
+            with self._lock:
+                stage = self.stages[name]
+                counts, count, total = list(stage.counts), stage.count, stage.total
+            for limit, n in zip(stage.buckets, counts):
+                lines.append(f'{PROMETHEUS_NAME}_bucket{{stage="{name}",le="{limit}"}} {n}')
+            lines.append(f'{PROMETHEUS_NAME}_bucket{{stage="{name}",le="+Inf"}} {count}')
+            lines.append(f'{PROMETHEUS_NAME}_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'{PROMETHEUS_NAME}_count{{stage="{name}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    # Zapis do pliku: .prom - format Prometheus, inaczej JSON
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus() if path.endswith('.prom') else self.to_json())
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+
+_registry = None # Wspólny rejestr dla całego programu
+_registry_lock = threading.Lock()
+
+# Zwraca wspólny rejestr (tworzony przy pierwszym użyciu)
+def get_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = Registry()
+        return _registry
+
+# Skróty do wspólnego rejestru
+def span(name):
+    return get_registry().span(name)
+
+def observe(name, seconds):
+    get_registry().observe(name, seconds)
+
+# Nakładka z p50/p95 etapów i aktualnym FPS (rysowana w pętli Pygame)
+def draw_overlay(screen, font, fps):
+    import pygame
+    lines = [f"FPS {fps:.1f}"]
+    for name, s in get_registry().summary().items():
+        lines.append(f"{name:<15}p50 {s['p50_ms']:7.1f}  p95 {s['p95_ms']:7.1f} ms  n={s['count']}")
+    surfaces = [font.render(line, True, (0, 255, 0)) for line in lines]
+    width = max(surface.get_width() for surface in surfaces) + 10
+    height = sum(surface.get_height() for surface in surfaces) + 10
+    background = pygame.Surface((width, height), pygame.SRCALPHA)
+    background.fill((0, 0, 0, 180))  # Półprzezroczyste tło
+    screen.blit(background, (5, 5))
+    y = 10
+    for surface in surfaces:
+        screen.blit(surface, (10, y))
+        y += surface.get_height()
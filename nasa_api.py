@@ -0,0 +1,201 @@
+import re
+import threading
+from itertools import islice
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
+import http_client
+import metrics
+
+SEARCH_BASE = "https://images-api.nasa.gov/search?media_type=image" # Link do wyszukiwania zdjęć
+ASSET_BASE = "https://images-api.nasa.gov/asset/" # Link do danych o plikach zdjęcia
+ASSET_WORKERS = 8 # Maksymalna liczba równoległych zapytań o pliki
+ASSET_TIMEOUT = 10 # Limit czasu pojedynczego zapytania (w sekundach)
+API_PAGE_SIZE = 100 # Liczba wyników na jednej stronie API (parametr page_size)
+THUMB_SUFFIX = re.compile(r'~[a-z]+\.jpg$', re.IGNORECASE) # Końcówka adresu podglądu (~thumb.jpg, ~small.jpg, ~medium.jpg...)
+FULL_SUFFIX = '~orig.jpg' # Końcówka adresu pełnego zdjęcia (pierwszy JPG na liście /asset)
+
+_executor = None # Wspólna pula wątków
+_resolved = {} # Ustalone adresy pełnych zdjęć: nasa_id -> URL
+_resolved_lock = threading.Lock()
+_resolution_counts = {'derived': 0, 'cached': 0, 'fallbacks': 0, 'asset_lookups': 0}
+_executor_lock = threading.Lock()
+
+# Zwraca wspólną pulę wątków (tworzona przy pierwszym użyciu)
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=ASSET_WORKERS, thread_name_prefix="asset")
+        return _executor
+
+# Postać kanoniczna zapytania: małe litery i pojedyncze spacje ("  MARS  rover" -> "mars rover")
+def normalize_query(query):
+    return " ".join(query.casefold().split())
+
+# Adres strony wyników z poprawnie zakodowanymi parametrami
+def search_url(api_base, query, page):
+    return f"{api_base}&{urlencode({'q': normalize_query(query), 'page': page, 'page_size': API_PAGE_SIZE})}"
+
+# Ujednolicony opis wyniku: nasa_id, tytuł, opis, słowa kluczowe, data, adres miniaturki i typ; None, jeśli brak miniaturki
+def parse_record(item):
+    links = item.get('links', [])  # Linki do miniaturki
+    if not links or not links[0].get('href'):
+        return None
+    data = item.get('data', [{}])[0]
+    return {
+        'nasa_id': data.get('nasa_id') or links[0]['href'].split('/')[-2],  # Unikalne ID (jest też częścią adresu miniaturki)
+        'title': data.get('title', ''),
+        'description': data.get('description', ''),
+        'keywords': data.get('keywords', []),  # Lista słów kluczowych
+        'date_created': data.get('date_created'),
+        'thumb_url': links[0].get('href'),  # URL miniaturki
+        'media_type': data.get('media_type'),
+    }
+
+# Adres następnej strony z collection.links (rel="next")
+def next_link(data):
+    for link in data.get('collection', {}).get('links', []):
+        if link.get('rel') == 'next':
+            return link.get('href')
+    return None
+
+# Treść odpowiedzi wyszukiwania albo wyjątek przy błędzie
+def _search_json(response):
+    if response.status_code != 200:
+        raise Exception(f'Nie udało się pobrać danych, kod błędu {response.status_code}')
+    return response.json()
+
+# Kolejne strony API (listy elementów) pobierane dopiero wtedy, gdy są potrzebne
+def _iter_pages(url, first_response=None, before_page=None):
+    response = first_response
+    while url:
+        if response is None:
+            if before_page is not None:
+                before_page()
+            with metrics.span('search'):
+                response = http_client.get(url)
+        data = _search_json(response)
+        response = None
+        url = next_link(data)
+        yield data.get('collection', {}).get('items', [])
+
+# Leniwe przeglądanie wyników przez kolejne strony API
+# Następna strona pobierana dopiero po wyczerpaniu bieżącej, więc w pamięci jest najwyżej jedna strona API
+# first_response - odpowiedź już pobrana dla url (np. zapytaniem warunkowym), aby nie pobierać jej drugi raz
+# before_page() - wywoływane przed każdym zapytaniem HTTP o stronę (np. czekanie na limit zapytań)
+def iter_results(url, first_response=None, before_page=None):
+    for items in _iter_pages(url, first_response, before_page):
+        for item in items:
+            record = parse_record(item)
+            if record:
+                yield record
+
+# Położenie strony interfejsu w wynikach API: (numer strony API, ile wyników pominąć)
+def page_location(page, page_size):
+    offset = (page - 1) * page_size
+    return offset // API_PAGE_SIZE + 1, offset % API_PAGE_SIZE
+
+# Wyniki jednej strony interfejsu o dowolnym rozmiarze (niezależnym od rozmiaru strony API)
+# Zwraca (lista wyników, odpowiedź pierwszej strony API); przy odpowiedzi 304 lista to None
+def results_page(api_base, query, page, page_size, headers=None):
+    api_page, skip = page_location(page, page_size)
+    url = search_url(api_base, query, api_page)
+    with metrics.span('search'):
+        response = http_client.get(url, headers=headers)
+    if response.status_code == 304:
+        return None, response
+    records = list(islice(iter_results(url, first_response=response), skip, skip + page_size))
+    return records, response
+
+# Pierwszy plik JPG z listy plików zdjęcia (zapytanie /asset), w razie błędu zwraca miniaturkę
+def asset_full_url(nasa_id, thumb_url, timeout=ASSET_TIMEOUT):
+    with _resolved_lock:
+        _resolution_counts['asset_lookups'] += 1
+    try:
+        with metrics.span('asset'):
+            asset = http_client.get(f"{ASSET_BASE}{nasa_id}", timeout=timeout).json()
+        for i in asset.get('collection', {}).get('items', []):
+            href = i.get('href', '')
+            if href.lower().endswith('.jpg'):
+                return href
+    except Exception:
+        pass
+    return thumb_url
+
+# Adres pełnego zdjęcia wyprowadzony z adresu miniaturki (.../<nasa_id>~small.jpg -> .../<nasa_id>~orig.jpg)
+# None, jeśli adres nie ma oczekiwanej postaci
+def derive_full_url(thumb_url):
+    match = THUMB_SUFFIX.search(thumb_url)
+    if match is None:
+        return None
+    return thumb_url[:match.start()] + FULL_SUFFIX
+
+# Adres pełnego zdjęcia: z pamięci (według nasa_id), wyprowadzony z miniaturki albo z zapytania /asset
+# Adres wyprowadzony nie jest sprawdzany od razu - dopiero przy otwarciu zdjęcia (fallback_full_url)
+def resolve_full_url(nasa_id, thumb_url, timeout=ASSET_TIMEOUT):
+    with _resolved_lock:
+        full_url = _resolved.get(nasa_id)
+        if full_url is not None:
+            _resolution_counts['cached'] += 1
+            return full_url
+    full_url = derive_full_url(thumb_url)
+    if full_url is not None:
+        with _resolved_lock:
+            _resolution_counts['derived'] += 1
+    else:
+        full_url = asset_full_url(nasa_id, thumb_url, timeout)
+    with _resolved_lock:
+        _resolved[nasa_id] = full_url
+    return full_url
+
+# Wyprowadzony adres okazał się błędny (np. 404 przy otwieraniu) - pytamy /asset i zapamiętujemy wynik
+def fallback_full_url(nasa_id, thumb_url, timeout=ASSET_TIMEOUT):
+    with _resolved_lock:
+        _resolution_counts['fallbacks'] += 1
+    full_url = asset_full_url(nasa_id, thumb_url, timeout)
+    with _resolved_lock:
+        _resolved[nasa_id] = full_url
+    return full_url
+
+# Sprawdzenie adresu zapytaniem HEAD; przy błędzie adres z /asset (np. przy rozgrzewaniu cache)
+def confirm_full_url(nasa_id, thumb_url, full_url, timeout=ASSET_TIMEOUT):
+    try:
+        if http_client.head(full_url, timeout=timeout).ok:
+            return full_url
+    except Exception:
+        pass
+    return fallback_full_url(nasa_id, thumb_url, timeout)
+
+# Czy błąd pobierania oznacza, że plik pod tym adresem nie istnieje
+def is_missing(error):
+    response = getattr(error, 'response', None)
+    return response is not None and response.status_code in (403, 404)
+
+# Liczniki ustalania adresów; derivation_success - odsetek wyprowadzonych adresów bez potrzeby fallbacku
+def resolution_stats():
+    with _resolved_lock:
+        stats = dict(_resolution_counts)
+    derived = stats['derived']
+    stats['derivation_success'] = round(100.0 * (derived - stats['fallbacks']) / derived, 1) if derived else None
+    return stats
+
+# Wyszukiwanie pełnych zdjęć dla listy (indeks, nasa_id, thumb_url)
+# on_resolved(indeks, full_url) jest wywoływane od razu dla adresów wyprowadzonych z miniaturki,
+# a dla pozostałych z wątku puli, zaraz po odpowiedzi /asset
+def resolve_full_urls(entries, on_resolved, timeout=ASSET_TIMEOUT):
+    def job(index, nasa_id, thumb_url):
+        full_url = resolve_full_url(nasa_id, thumb_url, timeout)
+        try:
+            on_resolved(index, full_url)
+        except Exception as e:
+            print("Błąd przy zapisie adresu zdjęcia:", e)
+        return full_url
+
+    executor = get_executor()
+    futures = []
+    for index, nasa_id, thumb_url in entries:
+        if derive_full_url(thumb_url) is not None:
+            job(index, nasa_id, thumb_url)  # Bez zapytania - nie ma na co czekać
+        else:
+            futures.append(executor.submit(job, index, nasa_id, thumb_url))
+    return futures
@@ -1,169 +1,289 @@
 import pygame
-import requests
+import http_client
 import io
 import sys
-import threading
-import sqlite3
+import time
+import nasa_api
+import nasa_cache
+import loader_pool
+import scroll_grid
+import full_image
+import frame_stats
+import surface_cache
+import metrics
+import thumb_atlas
+import redraw
 
-API_BASE = "https://images-api.nasa.gov/search?media_type=image" # Link do strony NASA z której pobieramy zdjęcia
-THUMB_SIZE = (160, 120) # Rozmiar miniaturki
-GRID_COLS = 4 # Liczba kolumn
-GRID_ROWS = 5 # Liczba wierszy
-NUM_IMAGES = GRID_COLS * GRID_ROWS # Łączna liczba zdjęć na stronie
+API_BASE = nasa_api.SEARCH_BASE # Link do strony NASA z której pobieramy zdjęcia
+THUMB_SIZE = (160, 120) # Rozmiar miniaturki przy skali 1
+THUMB_SCALE = 1.0 # Skala miniaturek (np. 2 na ekranach HiDPI), zmieniana klawiszami +/-
+THUMB_SCALES = (0.5, 3.0) # Najmniejsza i największa skala
+GRID_COLS = 4 # Liczba kolumn okna startowego (w oknie o innym rozmiarze wynika z szerokości)
+GRID_ROWS = 5 # Liczba wierszy okna startowego
+NUM_IMAGES = nasa_cache.PAGE_SIZE # Liczba zdjęć na stronie wyników (jednostka cache i pobierania)
 PADDING = 10 # Odstępy między zdjęciami
-# Obliczenie wielkości okna
+INFO_HEIGHT = 40 # Wysokość paska z informacjami
+# Startowa wielkość okna (można ją zmieniać)
 WINDOW_SIZE = (
     GRID_COLS * (THUMB_SIZE[0] + PADDING) + PADDING,
-    GRID_ROWS * (THUMB_SIZE[1] + PADDING) + PADDING + 40
+    GRID_ROWS * (THUMB_SIZE[1] + PADDING) + PADDING + INFO_HEIGHT
 )
+SCROLL_STEP = 60 # Przewinięcie o jeden ząbek kółka myszy (w pikselach)
 FPS = 30
 QUERY = "" # Domyślne zapytanie
-DB_FILE = 'cache.db' # Nazwa pliku bazy danych SQLite
+ATLAS = None # Atlas miniaturek w rozmiarze THUMB_SIZE (plik nasa_cache.ATLAS_FILE, tworzony w init_atlas)
 
-# Inicjalizacja baze danych SQLite
-def init_db():
-    conn = sqlite3.connect(DB_FILE)  # Połączenie z plikiem bazy danych
-    c = conn.cursor()  # Obiekt do wykonywania zapytań
-    # Tworzenie tabeli
-    c.execute(
-        '''
-        CREATE TABLE IF NOT EXISTS cache (
-            query TEXT,            -- fraza wyszukiwania
-            page INTEGER,          -- numer strony wyników
-            img_index INTEGER,     -- indeks obrazka w siatce
-            thumb_url TEXT,        -- URL miniaturki
-            full_url TEXT,         -- URL pełnego zdjęcia
-            PRIMARY KEY (query, page, img_index)  -- unikalny klucz
-        )
-        '''
-    )
-    conn.commit()  # Zapis zmian
-    return conn  # Zwrócenie połączenia do dalszego użycia
+# Otwarcie cache (nasa_cache.init_db) i atlasu miniaturek
+def init_db(db_file=None):
+    conn = nasa_cache.init_db(db_file)
+    init_atlas(conn)
+    return conn
+
+# Otwarcie atlasu miniaturek w bazie conn (bez atlasu, jeśli nasa_cache.ATLAS_FILE to None)
+def init_atlas(conn):
+    global ATLAS
+    if nasa_cache.ATLAS_FILE:
+        ATLAS = thumb_atlas.ThumbAtlas(conn, nasa_cache.DB_LOCK, nasa_cache.ATLAS_FILE, THUMB_SIZE)  # Miniaturki bez dekodowania JPEG
 
-# Funkcja do całkowitego wyczyszczenia bazy danych
-def clear_db(db_conn):
-    c = db_conn.cursor()
-    c.execute('DELETE FROM cache')  # usunięcie wszystkich rekordów
-    db_conn.commit()  # zapis zmian
-    print("Baza danych została wyczyszczona.")
+# Zdekodowanie zdjęcia i zapis jego wymiarów w metadanych
+def decode_image(url, data):
+    with metrics.span('decode'):
+        img = pygame.image.load(io.BytesIO(data))  # Wczytanie zdjęcia do Pygame
+    if nasa_cache.BLOBS:
+        nasa_cache.BLOBS.set_dimensions(url, *img.get_size())
+    return img
+
+# Zapis pobranej miniaturki w atlasie (zdekodowanej i przeskalowanej do THUMB_SIZE), np. przy rozgrzewaniu cache
+def fill_atlas(url, data):
+    img = decode_image(url, data)
+    with metrics.span('scale'):
+        surface = pygame.transform.scale(img, THUMB_SIZE)
+    ATLAS.put(url, surface)
+
+# Miniaturka bez dekodowania: z pamięci podręcznej albo z atlasu (w innym rozmiarze skalowana z atlasu)
+# Zwraca (powierzchnia albo None, czy gotowa); atlas ma rozdzielczość THUMB_SIZE, więc większej miniaturki
+# nie zastąpi - powiększenie jest tylko podglądem do czasu zdekodowania zdjęcia i nie trafia do pamięci podręcznej
+def cached_thumbnail(url, size):
+    surface = surface_cache.get_cache().get(url, size)
+    if surface is not None or ATLAS is None:
+        return surface, surface is not None
+    surface = ATLAS.get(url)  # Piksele wprost z pliku (bez kopiowania)
+    if surface is None or size == THUMB_SIZE:
+        return surface, surface is not None
+    with metrics.span('scale'):
+        surface = pygame.transform.scale(surface, size)
+    if size[0] > THUMB_SIZE[0] or size[1] > THUMB_SIZE[1]:
+        return surface, False
+    surface_cache.get_cache().put(url, size, surface)  # Kopia po skalowaniu - nie zależy od atlasu
+    return surface, True
 
 # Klasa reprezentująca pojedyncze zdjęcie
+# Kafelek nie ma stałej pozycji - miejsce w oknie wynika z indeksu wyniku (scroll_grid.GridLayout)
 class ImageTile:
-    def __init__(self, thumb_url, full_url, position):
+    def __init__(self, thumb_url, full_url, generation=None, priority=loader_pool.PRIORITY_VISIBLE, db_conn=None, size=THUMB_SIZE):
         self.thumb_url = thumb_url # URL miniaturki
         self.full_url = full_url # URL zdjęcia
-        self.position = position # Pozycja zdjęcia w oknie
-        self.thumb_surface = self.get_placeholder() # Placeholder
-        self.loaded = False # Sprawdza czy zdjęcie zostało załadowane
-        threading.Thread(target=self.async_load_thumbnail, daemon=True).start() # Asynchroniczne wczytywanie zdjęć
+        self.db_conn = db_conn # Baza, w której poprawiamy adres zdjęcia, jeśli okaże się błędny
+        self.size = size # Rozmiar miniaturki na ekranie
+        cached, ready = cached_thumbnail(thumb_url, size) # Miniaturka zdekodowana wcześniej
+        self.thumb_surface = cached # Miniaturka albo podgląd z atlasu (None - jeszcze niewczytana albo zwolniona)
+        self.loaded = ready # Sprawdza czy zdjęcie zostało załadowane
+        self.generation = generation # Pokolenie strony, dla której powstał kafelek
+        self.priority = priority # Priorytet zadania w puli
+        if not self.loaded:
+            loader_pool.get_pool().submit(self.async_load_thumbnail, priority, generation) # Wczytywanie zdjęć we wspólnej puli
 
     # Placeholder
     def get_placeholder(self):
-        surface = pygame.Surface(THUMB_SIZE)  # Utworzenie powierzchni o rozmiarze miniaturki
-        surface.fill((100, 100, 100))
+        surface = pygame.Surface(self.size)  # Utworzenie powierzchni o rozmiarze miniaturki
+        surface.fill(scroll_grid.PLACEHOLDER_COLOR)
         return surface
 
+    # Zlecenie wczytania miniaturki w nowym pokoleniu (np. kafelek wrócił na ekran) lub w nowym rozmiarze
+    def schedule(self, generation, priority, size=None):
+        if size is not None and size != self.size:
+            self.size = size
+            self.thumb_surface = None
+            self.loaded = False
+            self.generation = None
+        if self.loaded or (self.generation == generation and self.priority <= priority):
+            return
+        cached, ready = cached_thumbnail(self.thumb_url, self.size)
+        if cached is not None:
+            self.thumb_surface = cached  # Gotowa miniaturka albo podgląd z atlasu do czasu zdekodowania
+        if ready:
+            self.loaded = True
+            return
+        self.generation = generation
+        self.priority = priority
+        loader_pool.get_pool().submit(self.async_load_thumbnail, priority, generation)
+
+    # Oddanie miniaturki kafelka, który zjechał z ekranu (zostaje w surface_cache, dopóki mieści się w limicie)
+    def release(self):
+        self.thumb_surface = None
+        self.loaded = False
+        self.generation = None
+
     # Asynchroniczne pobieranie miniaturki z internetu
     def async_load_thumbnail(self):
+        if self.loaded:
+            return  # Zadanie zlecone ponownie, a miniaturka jest już gotowa
+        size = self.size
         try:
-            r = requests.get(self.thumb_url, timeout=10)  # Pobranie danych zdjęcia
-            buf = io.BytesIO(r.content)  # Zapis bajtów
-            img = pygame.image.load(buf)  # Wczytanie zdjęcia do Pygame
-            self.thumb_surface = pygame.transform.scale(img, THUMB_SIZE) # Skalowanie do rozmiaru miniaturki
+            data = nasa_cache.load_image_bytes(self.thumb_url)  # Pobranie danych zdjęcia (dysk lub internet)
+            if not loader_pool.get_pool().is_current(self.generation):
+                return  # Kafelek zjechał z ekranu w trakcie pobierania - nie dekodujemy
+            img = decode_image(self.thumb_url, data)  # Wczytanie zdjęcia do Pygame
+            with metrics.span('scale'):
+                surface = pygame.transform.scale(img, size) # Skalowanie do rozmiaru miniaturki
+            surface_cache.get_cache().put(self.thumb_url, size, surface)
+            if ATLAS is not None:
+                with metrics.span('cache_write'):
+                    # Przy następnym uruchomieniu miniaturka będzie gotowa bez dekodowania
+                    ATLAS.put(self.thumb_url, surface if size == THUMB_SIZE else pygame.transform.scale(img, THUMB_SIZE))
+            if size != self.size:
+                return  # W międzyczasie zmieniono rozmiar miniaturek
+            self.thumb_surface = surface
             self.loaded = True  # Oznaczenie jako załadowane
+            redraw.notify(self)  # Pętla odświeży tylko ten kafelek
         except Exception as e:
             print("Nie udało się wczytać miniaturki:", e)  # Błąd
 
-    # Pobranie i skalowanie pełnego zdjęcia
-    def load_full_image(self):
+    # Pobranie i skalowanie pełnego zdjęcia (wywoływane w tle przez FullImageJob)
+    def load_full_image(self, screen_size, on_progress=None, cancelled=None):
+        cache = surface_cache.get_cache()
+        surface = cache.get(self.full_url, screen_size)  # Zdjęcie otwierane już wcześniej
+        if surface is not None:
+            return surface
         try:
-            r = requests.get(self.full_url, timeout=10)  # Pobiera zdjęcia
-            buf = io.BytesIO(r.content)  # Zapis bajtów
-            img = pygame.image.load(buf)  # Wczytanie do Pygame
-            sw, sh = pygame.display.get_surface().get_size()  # rozmiar okna
-            iw, ih = img.get_size()  # Oryginalne wymiary zdjęcia
-            scale = min(sw/iw, sh/ih)  # Współczynnik skalowania
-            new_size = (int(iw*scale), int(ih*scale))  # Nowe wymiary
-            return pygame.transform.scale(img, new_size)  # Zwrócenie przeskalowanego zdjęcia
+            data = nasa_cache.load_image_bytes(self.full_url, on_progress, cancelled, 'full_download')  # Pobiera zdjęcia (dysk lub internet)
         except Exception as e:
-            print("Błąd przy wczytywaniu zdjęcia:", e)
-            return None
+            if not nasa_api.is_missing(e) or self.full_url != nasa_api.derive_full_url(self.thumb_url):
+                raise
+            # Adresu wyprowadzonego z miniaturki nie ma na serwerze - ustalamy go przez /asset
+            nasa_id = self.thumb_url.split('/')[-2]
+            self.full_url = nasa_api.fallback_full_url(nasa_id, self.thumb_url)
+            if self.db_conn is not None:
+                nasa_cache.save_full_urls(self.db_conn, [(nasa_id, self.full_url)])
+            data = nasa_cache.load_image_bytes(self.full_url, on_progress, cancelled, 'full_download')
+        if data is None:
+            return None  # Przerwane przez użytkownika
+        img = decode_image(self.full_url, data)  # Wczytanie do Pygame
+        with metrics.span('scale'):
+            surface = pygame.transform.scale(img, full_image.fit_size(img.get_size(), screen_size))  # Przeskalowane zdjęcie
+        cache.put(self.full_url, screen_size, surface)
+        return surface
+
+    # Otwarcie pełnego zdjęcia bez blokowania pętli - najpierw pokazuje powiększoną miniaturkę
+    def open_full_image(self, screen_size):
+        return full_image.FullImageJob(
+            self.thumb_surface or self.get_placeholder(), screen_size,
+            lambda on_progress, cancelled: self.load_full_image(screen_size, on_progress, cancelled)
+        )
+
+# Układ siatki dla okna o rozmiarze view_size i skali miniaturek scale
+def grid_layout(view_size, scale):
+    size = (round(THUMB_SIZE[0] * scale), round(THUMB_SIZE[1] * scale))
+    return scroll_grid.GridLayout(view_size, size, PADDING, INFO_HEIGHT)
+
+# Uruchamia wyszukiwanie pełnych zdjęć i zapisuje je w kafelkach oraz w cache
+# pending - lista (indeks kafelka, nasa_id, thumb_url)
+def resolve_tiles(tiles, pending, db_conn):
+    tiles = list(tiles)  # Kafelki z chwili zlecenia (lista strony może zostać podmieniona wynikami z API)
+    def on_resolved(index, full_url):
+        tiles[index].full_url = full_url
+    nasa_cache.resolve_full_urls(db_conn, pending, on_resolved)
 
 # Funkcja pobierająca zdjęcia
-def fetch_nasa_images(query, page, db_conn):
+# generation/priority - pokolenie i priorytet ładowania miniaturek (domyślnie nowe pokolenie, strona widoczna)
+# size - rozmiar miniaturek na ekranie
+# on_end(count) - wywoływane, gdy strona API jest ostatnia (count wyników), przy wynikach z lokalnego indeksu później z tła
+# Błąd pobierania bez wyników do pokazania przechodzi do wywołującego (np. siatka ponowi pobranie)
+def fetch_nasa_images(query, page, db_conn, generation=None, priority=loader_pool.PRIORITY_VISIBLE, size=THUMB_SIZE, on_end=None):
     tiles = []
-    c = db_conn.cursor()
-    # Próba pobrania z cache
-    c.execute(
-        'SELECT img_index, thumb_url, full_url FROM cache WHERE query=? AND page=? ORDER BY img_index',
-        (query, page)
-    )
-    rows = c.fetchall()  # Pobranie wszystkich pasujących wierszy
+    if generation is None:
+        generation = loader_pool.get_pool().new_generation()  # Anuluje ładowanie miniaturek poprzedniej strony
+    qid, rows, fetched_at = nasa_cache.read_page(db_conn, query, page)  # Próba pobrania z cache
     if rows:
         print(f"Ładowanie z cache: {query}, strona {page}")
-        for img_index, thumb, full in rows:
-            col = img_index % GRID_COLS
-            row = img_index // GRID_COLS
-            x = PADDING + col*(THUMB_SIZE[0]+PADDING)
-            y = PADDING + row*(THUMB_SIZE[1]+PADDING)
-            tiles.append(ImageTile(thumb, full, (x, y)))
+        if nasa_cache.is_stale(fetched_at):
+            nasa_cache.schedule_refresh(db_conn, API_BASE, query, qid, page, NUM_IMAGES)  # Pokazujemy stare dane, nowe pobieramy w tle
+        pending = []  # Zdjęcia bez ustalonego pełnego zdjęcia (np. program zamknięto w trakcie)
+        for img_index, nasa_id, thumb, full in rows:
+            tiles.append(ImageTile(thumb, full or thumb, generation, priority, db_conn, size))
+            if full is None:
+                pending.append((img_index, nasa_id, thumb))
+        if pending:
+            resolve_tiles(tiles, pending, db_conn)
+        if fetched_at is not None and len(rows) < NUM_IMAGES and on_end is not None:
+            on_end(len(rows))  # Strona zapisana z krótszej odpowiedzi API
         return tiles  # Zwrócenie kafelków
 
-    # Jeśli brak w bazie danych, pobierz ze strony
-    url = f"{API_BASE}&q={query}&page={page}"
-    print("Fetching from API:", url)
+    # Jeśli brak w bazie danych - od razu wyniki z lokalnego indeksu, a strona z API dołącza w tle
+    local = nasa_cache.local_search(db_conn, query, NUM_IMAGES, (page - 1) * NUM_IMAGES)
+    if local:
+        print(f"Wyniki z lokalnego indeksu: {query}, strona {page}")
+        pending = []  # Wyniki bez ustalonego pełnego zdjęcia - adresy uzupełniane w tle
+        for nasa_id, thumb_url, full_url in local:
+            tiles.append(ImageTile(thumb_url, full_url or thumb_url, generation, priority, db_conn, size))
+            if full_url is None:
+                pending.append((len(tiles) - 1, nasa_id, thumb_url))
+        if pending:
+            resolve_tiles(tiles, pending, db_conn)
+        nasa_api.get_executor().submit(merge_api_page, query, qid, page, db_conn, generation, priority, tiles, size, on_end)
+        return tiles
+    return fetch_api_page(query, qid, page, db_conn, generation, priority, tiles, size, on_end)
+
+# Pobranie strony z API w tle, gdy pokazane są już wyniki z lokalnego indeksu (bez połączenia zostają one)
+def merge_api_page(query, qid, page, db_conn, generation, priority, tiles, size, on_end):
     try:
-        r = requests.get(url, timeout=10)  # Wysłanie zapytania
-        data = r.json()
+        fetch_api_page(query, qid, page, db_conn, generation, priority, tiles, size, on_end)
     except Exception as e:
         print("Błąd pobierania danych:", e)
-        return []
 
-    items = data.get('collection', {}).get('items', [])  # Lista elementów
-    count = 0  # Licznik załadowanych miniaturek
-    for item in items:
-        if count >= NUM_IMAGES:
-            break  
-        links = item.get('links', [])  # Linki do miniaturki
-        if not links:
-            continue
-        thumb_url = links[0].get('href')  # URL miniaturki
-        nasa_id = item.get('data', [{}])[0].get('nasa_id')  # Unikalne ID
-        full_url = thumb_url
-        # Próba pobrania pliku JPG
-        try:
-            asset = requests.get(f"https://images-api.nasa.gov/asset/{nasa_id}", timeout=10).json()
-            for i in asset.get('collection', {}).get('items', []):
-                href = i.get('href', '')
-                if href.lower().endswith('.jpg'):
-                    full_url = href
-                    break
-        except:
-            pass
-
-        # Zapis do cache
-        c.execute(
-            'INSERT OR REPLACE INTO cache(query,page,img_index,thumb_url,full_url) VALUES (?,?,?,?,?)',
-            (query, page, count, thumb_url, full_url)
-        )
-        db_conn.commit()  # zapis zmian
-
-        # Obliczenie pozycji kafelka
-        col = count % GRID_COLS
-        row = count // GRID_COLS
-        x = PADDING + col*(THUMB_SIZE[0]+PADDING)
-        y = PADDING + row*(THUMB_SIZE[1]+PADDING)
-        tiles.append(ImageTile(thumb_url, full_url, (x, y)))  # Dodanie do listy
-        count += 1
+# Pobranie strony z API i zapis w cache
+# qid - numer zapytania w cache (None - zapytanie jeszcze niezapisane)
+# tiles - kafelki już pokazane (np. z lokalnego indeksu); są zamieniane w miejscu na wyniki z API,
+# a kafelki tych samych zdjęć używane ponownie. Błąd połączenia przechodzi do wywołującego.
+def fetch_api_page(query, qid, page, db_conn, generation, priority, tiles, size=THUMB_SIZE, on_end=None):
+    print(f"Fetching from API: {query}, strona {page}")
+    records, known = nasa_cache.fetch_page(db_conn, API_BASE, query, qid, page, NUM_IMAGES)  # Pełne adresy zostaną uzupełnione w tle
+    shown = {tile.thumb_url: tile for tile in tiles}
+    merged = []
+    pending = []  # Zdjęcia czekające na adres pełnego pliku
+    for count, rec in enumerate(records):
+        tile = shown.get(rec['thumb_url'])
+        if tile is None:
+            # Kafelek pokazuje się od razu, do czasu ustalenia pełnego zdjęcia używa miniaturki
+            tile = ImageTile(rec['thumb_url'], rec['thumb_url'], generation, priority, db_conn, size)
+        if rec['nasa_id'] in known:
+            tile.full_url = known[rec['nasa_id']]  # Ustalony już przy innym zapytaniu
+        else:
+            pending.append((count, rec['nasa_id'], rec['thumb_url']))
+        merged.append(tile)
+    tiles[:] = merged  # Jedna zamiana - pętla rysująca widzi całą starą albo całą nową listę
+    redraw.notify()  # Inny układ kafelków - strona do przerysowania
 
+    resolve_tiles(tiles, pending, db_conn)
+    if len(records) < NUM_IMAGES and on_end is not None:
+        on_end(len(records))  # Wyniki skończyły się na tej stronie
     return tiles
 
+# Przewijana siatka wyników zapytania (strony wokół ekranu pobierane w tle)
+def make_grid(query, db_conn, layout):
+    return scroll_grid.ScrollGrid(
+        lambda page, generation, priority, size, on_end: fetch_nasa_images(query, page, db_conn, generation, priority, size, on_end),
+        NUM_IMAGES, layout
+    )
+
 # Ekran wprowadzania zapytania przez użytkownika
 def search_input_screen():
     global QUERY
-    pygame.init()  # Inicjalizacja Pygame
+    pygame.display.init()  # Tylko obraz i czcionki - bez dźwięku i joysticków (krótszy start)
+    pygame.font.init()
     screen = pygame.display.set_mode((600,200))  # Tymczasowe okno
     pygame.display.set_caption("Wpisz frazę wyszukiwania NASA")
+    http_client.prepare()  # Biblioteka HTTP ładuje się w tle, gdy użytkownik pisze
     clock = pygame.time.Clock()
     font = pygame.font.SysFont(None,36)  # Czcionka
     input_box = pygame.Rect(50,80,500,40)  # Pole tekstowe
@@ -198,59 +318,134 @@ def search_input_screen():
 
 def main():
     global QUERY
+    search_input_screen()  # Ekran z wpisywaniem zapytania (okno od razu, przed otwarciem bazy)
     db_conn = init_db()  # Utworzenie/otwarcie bazy danych
-    search_input_screen()  # Ekran z wpisywaniem zapytania
-    screen = pygame.display.set_mode(WINDOW_SIZE)  # Główne okno
+    screen = pygame.display.set_mode(WINDOW_SIZE, pygame.RESIZABLE)  # Główne okno (rozmiar można zmieniać)
     pygame.display.set_caption("Wyszukiwarka zdjęć NASA")
     clock = pygame.time.Clock()
     font = pygame.font.SysFont(None,24)
-    current_page = 1  # Strona początkowa
-    tiles = fetch_nasa_images(QUERY, current_page, db_conn)  # Pobiera pierwszą stronę zdjęć
-    fullscreen = None
+    scale = THUMB_SCALE  # Skala miniaturek (klawisze +/-)
+    grid = make_grid(QUERY, db_conn, grid_layout(screen.get_size(), scale))  # Wyniki przewijane bez podziału na strony
+    fullscreen = None  # Otwierane zdjęcie (FullImageJob)
+    frames = frame_stats.FrameHistogram()  # Czasy klatek (od zdarzenia do odświeżenia ekranu)
+    overlay = False  # Nakładka z czasami etapów (klawisz m)
+    overlay_font = pygame.font.SysFont('monospace', 14)
+    info_label = redraw.TextCache(font, (255,255,255))  # Pasek z informacjami renderowany tylko po zmianie
+    dirty = redraw.DirtyRects()  # Obszary do odświeżenia
+    changed = []  # Kafelki z nowo wczytaną miniaturką
     running = True  # Status pętli
     while running:
-        clock.tick(FPS)
-        for event in pygame.event.get():
+        # Bez zmian pętla śpi; klatki co 1/FPS tylko przy pasku postępu lub nakładce
+        animating = overlay or (fullscreen is not None and not fullscreen.done)
+        events = redraw.wait_events(animating, FPS)
+        frame_start = time.perf_counter()
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type == redraw.REDRAW:
+                if event.tile is None:
+                    dirty.all()
+                elif event.tile in grid.shown:
+                    changed.append(event.tile)  # Miniaturki spoza ekranu (margines) nie są widoczne
+            elif event.type in redraw.EXPOSE_EVENTS:
+                dirty.all()
+            elif event.type == pygame.VIDEORESIZE:
+                screen = pygame.display.get_surface()
+                grid.set_layout(grid_layout(screen.get_size(), scale))  # Liczba kolumn wynika z nowej szerokości
+                dirty.all()
+            elif event.type == pygame.MOUSEWHEEL and not fullscreen:
+                grid.scroll_by(-event.y * SCROLL_STEP)
+                dirty.all()
             elif event.type == pygame.KEYDOWN:
+                dirty.all()
                 if event.key == pygame.K_q:
                     running = False
-                elif event.key == pygame.K_n and not fullscreen:
-                    current_page += 1
-                    tiles = fetch_nasa_images(QUERY, current_page, db_conn)  # Następna strona
-                elif event.key == pygame.K_b and current_page>1 and not fullscreen:
-                    current_page -= 1
-                    tiles = fetch_nasa_images(QUERY, current_page, db_conn)  # Poprzednia strona
-                elif event.key == pygame.K_r and not fullscreen:
+                elif event.key == pygame.K_m:
+                    overlay = not overlay
+                elif fullscreen:
+                    if event.key == pygame.K_ESCAPE:
+                        fullscreen.cancel()  # Przerywa pobieranie, jeśli jeszcze trwa
+                        fullscreen = None  # Zamknięcie pełnego ekranu
+                elif event.key in (pygame.K_n, pygame.K_PAGEDOWN):
+                    grid.scroll_by(grid.layout.view.height)  # Ekran w dół
+                elif event.key in (pygame.K_b, pygame.K_PAGEUP):
+                    grid.scroll_by(-grid.layout.view.height)  # Ekran w górę
+                elif event.key == pygame.K_DOWN:
+                    grid.scroll_by(grid.layout.cell_h)
+                elif event.key == pygame.K_UP:
+                    grid.scroll_by(-grid.layout.cell_h)
+                elif event.key == pygame.K_HOME:
+                    grid.scroll_by(-grid.scroll)
+                elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS, pygame.K_MINUS, pygame.K_KP_MINUS):
+                    step = 1.25 if event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS) else 0.8
+                    scale = min(max(THUMB_SCALES[0], scale * step), THUMB_SCALES[1])
+                    grid.set_layout(grid_layout(screen.get_size(), scale))  # Większe miniaturki - mniej kolumn
+                elif event.key == pygame.K_r:
+                    size = screen.get_size()
                     search_input_screen()
-                    screen = pygame.display.set_mode(WINDOW_SIZE)  # Przywrócenie rozmiaru głównego okna
-                    current_page = 1
-                    tiles = fetch_nasa_images(QUERY, current_page, db_conn)
+                    screen = pygame.display.set_mode(size, pygame.RESIZABLE)  # Przywrócenie rozmiaru głównego okna
+                    grid = make_grid(QUERY, db_conn, grid_layout(size, scale))  # Nowe zapytanie - nowa siatka
                     pygame.display.set_caption("Wyszukiwarka zdjęć NASA") # Ponowne wyszukiwanie
-                elif event.key == pygame.K_ESCAPE and fullscreen:
-                    fullscreen = None  # Zamknięcie pełnego ekranu
-                elif event.key == pygame.K_c and not fullscreen:
-                    clear_db(db_conn)
-                    tiles = fetch_nasa_images(QUERY, current_page, db_conn)
+                elif event.key == pygame.K_c:
+                    nasa_cache.invalidate(db_conn, query=QUERY)  # Usuwa tylko bieżące zapytanie
+                    grid.clear()
             elif event.type == pygame.MOUSEBUTTONDOWN and event.button==1 and not fullscreen:
-                for tile in tiles:
-                    rect = pygame.Rect(tile.position, THUMB_SIZE)
-                    if rect.collidepoint(event.pos):
-                        img = tile.load_full_image()  # Ładowanie pełnego ekranu
-                        if img:
-                            fullscreen = img
-                        break
-        screen.fill((50,50,50))
+                tile = grid.tile_at(event.pos)
+                if tile is not None:
+                    fullscreen = tile.open_full_image(screen.get_size())  # Ładowanie pełnego ekranu w tle
+                    dirty.all()
+        grid.update()  # Strony i miniaturki wokół ekranu
+        if fullscreen and fullscreen.failed:
+            fullscreen = None  # Nie udało się wczytać - powrót do siatki
+            dirty.all()
+        if animating:
+            dirty.all()  # Pasek postępu i nakładka zmieniają się w każdej klatce
+        render_start = time.perf_counter()
+        width, height = screen.get_size()
         if fullscreen:
-            rect = fullscreen.get_rect(center=screen.get_rect().center)
-            screen.blit(fullscreen, rect)  # Wyświetlenie pełnego ekranu
+            if dirty.everything:
+                screen.fill((50,50,50))
+                rect = fullscreen.surface.get_rect(center=screen.get_rect().center)
+                screen.blit(fullscreen.surface, rect)  # Wyświetlenie pełnego ekranu
+                fullscreen.draw_progress(screen)  # Postęp pobierania
         else:
-            info = f"Zapytanie: {QUERY} |  n: dalej, b: wstecz, r: szukaj, q: wyjście, c: czyść db, ESC: zamknij zdj)"
-            screen.blit(font.render(info, True, (255,255,255)), (PADDING, WINDOW_SIZE[1]-30)) # Pasek z informacjami
-            for t in tiles:
-                screen.blit(t.thumb_surface, t.position)  # Miniaturki
-        pygame.display.flip()  # Odświeżenie ekranu
+            if dirty.everything:
+                grid.draw(screen)  # Widoczne miniaturki
+            else:
+                for t in changed:
+                    rect = grid.draw_tile(screen, t)  # Tylko nowo wczytane miniaturki
+                    if rect is not None:
+                        dirty.add(rect)
+            info = f"Zapytanie: {QUERY} | wyniki {grid.visible_text()} | kółko/strzałki/n/b: przewijanie, +/-: rozmiar, r: szukaj, q: wyjście, c: odśwież zapytanie, m: czasy, ESC: zamknij zdj | {surface_cache.get_cache().info_text()}"
+            label, label_changed = info_label.render(info)
+            if label_changed or dirty.everything:
+                info_rect = pygame.Rect(0, height - INFO_HEIGHT, width, INFO_HEIGHT)
+                screen.fill((50,50,50), info_rect)
+                screen.blit(label, (PADDING, height - 30)) # Pasek z informacjami
+                dirty.add(info_rect)
+        changed = []
+        if overlay:
+            metrics.draw_overlay(screen, overlay_font, clock.get_fps())  # p50/p95 etapów i FPS
+        if not dirty:
+            continue  # Nic się nie zmieniło (np. ruch myszy)
+        dirty.update()  # Odświeżenie zmienionych obszarów ekranu
+        metrics.observe('render', time.perf_counter() - render_start)
+        frames.add(1000 * (time.perf_counter() - frame_start))
+        clock.tick(FPS)  # Najwyżej FPS klatek na sekundę, także przy serii wczytanych miniaturek
+    nasa_cache.BLOBS.flush()  # Zaległe czasy użycia zdjęć
+    print("Statystyki cache zdjęć:", nasa_cache.BLOBS.stats())  # Trafienia/chybienia/usunięcia do doboru limitu
+    if ATLAS is not None:
+        ATLAS.flush()
+        print("Statystyki atlasu miniaturek:", ATLAS.stats())  # Miniaturki bez dekodowania JPEG
+    print("Statystyki połączeń:", http_client.timing_summary())  # Czasy DNS, łączenia, TLS i transferu
+    print("Łączenie zapytań:", http_client.coalescing_stats(), nasa_cache.IMAGE_FLIGHTS.stats())  # Pobrania wspólne dla kilku wywołań
+    if http_client.archive_stats() is not None:
+        print("Archiwum HTTP:", http_client.archive_stats())  # Nagrane albo odtworzone odpowiedzi
+    print("Statystyki puli miniaturek:", loader_pool.get_pool().stats())  # Kolejka i pominięte zadania
+    print("Statystyki siatki:", grid.stats())  # Strony i miniaturki trzymane w pamięci
+    print("Czasy klatek:", frames.summary())  # Histogram czasów klatek
+    print("Statystyki adresów zdjęć:", nasa_api.resolution_stats())  # Jak często adres z miniaturki wystarczył
+    print("Czasy etapów:", metrics.get_registry().to_json())  # p50/p95 pobierania, cache, dekodowania i rysowania
     pygame.quit()  # Zamyka pygame
     sys.exit()  # Kończy program
 
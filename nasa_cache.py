@@ -0,0 +1,372 @@
+import re
+import sys
+import time
+import threading
+import sqlite3
+import http_client
+import nasa_api
+import blob_cache
+import metrics
+import single_flight
+
+# Cache wyników wyszukiwania w SQLite i magazyn pobranych zdjęć - bez pygame i bez okna
+# Strony wyników: odczyt, pobranie z API z zapisem, odświeżanie w tle i ustalanie adresów pełnych zdjęć
+# Używany przez przeglądarkę (nasa_baza.py), rozgrzewanie (warm.py) i pomiary (bench.py)
+
+DB_FILE = 'cache.db' # Nazwa pliku bazy danych SQLite
+DB_LOCK = threading.Lock() # Blokada połączenia z bazą (używane też z wątków puli)
+DB_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',    # Dziennik WAL - odczyty nie blokują zapisu
+    'PRAGMA synchronous=NORMAL',  # W trybie WAL wystarczy synchronizacja przy punktach kontrolnych
+    'PRAGMA cache_size=-8000',    # 8 MB pamięci podręcznej stron
+    'PRAGMA temp_store=MEMORY',   # Tabele tymczasowe w pamięci
+)
+CACHE_TTL = 24 * 60 * 60 # Po tylu sekundach strona w cache jest odświeżana w tle
+PAGE_SIZE = 20 # Liczba zdjęć na stronie wyników (jednostka cache i pobierania; 4 x 5 kafelków okna przeglądarki)
+BLOB_DIR = 'blobs' # Katalog z pobranymi zdjęciami
+BLOB_MAX_BYTES = 512 * 1024 * 1024 # Limit miejsca na zdjęcia (512 MB)
+ATLAS_FILE = 'thumbs.atlas' # Plik z gotowymi miniaturkami (None - bez atlasu; otwierany w nasa_baza, bo wymaga pygame)
+BLOBS = None # Magazyn zdjęć na dysku (tworzony w init_db)
+FTS = False # Czy SQLite ma FTS5 (lokalne wyszukiwanie w metadanych)
+IMAGE_FLIGHTS = single_flight.SingleFlight(len) # Równoczesne wczytania tego samego zdjęcia (np. podgląd i widoczna strona)
+
+# Inicjalizacja baze danych SQLite
+# Połączenie jest współdzielone z wątkami puli, dostęp chroni DB_LOCK
+def init_db(db_file=None):
+    conn = sqlite3.connect(db_file or DB_FILE, check_same_thread=False)  # Połączenie z plikiem bazy danych
+    c = conn.cursor()  # Obiekt do wykonywania zapytań
+    for pragma in DB_PRAGMAS:
+        c.execute(pragma)
+    # Tabela zapytań - każda fraza w postaci kanonicznej zapisana tylko raz
+    c.execute(
+        '''
+        CREATE TABLE IF NOT EXISTS queries (
+            id INTEGER PRIMARY KEY,  -- numer zapytania
+            text TEXT UNIQUE         -- fraza po normalizacji
+        )
+        '''
+    )
+    # Stare formaty cache: adresy zapisane osobno w każdym wierszu (query, page, img_index)
+    columns = [col[1] for col in c.execute('PRAGMA table_info(cache)')]
+    legacy_rows = []
+    if 'query' in columns:
+        legacy_rows = [
+            (query_id(conn, query), page, img_index, thumb_url, full_url)
+            for query, page, img_index, thumb_url, full_url
+            in c.execute('SELECT query, page, img_index, thumb_url, full_url FROM cache').fetchall()
+        ]
+    elif columns:
+        legacy_rows = c.execute('SELECT query_id, page, img_index, thumb_url, full_url FROM cache').fetchall()
+    # Zdjęcia - każde zapisane raz, niezależnie od tego, w ilu zapytaniach wystąpiło
+    c.execute(
+        '''
+        CREATE TABLE IF NOT EXISTS items (
+            nasa_id TEXT PRIMARY KEY,  -- unikalne ID zdjęcia
+            thumb_url TEXT,            -- URL miniaturki
+            full_url TEXT,             -- URL pełnego zdjęcia (NULL - jeszcze nieustalony)
+            title TEXT,                -- tytuł
+            description TEXT,          -- opis
+            keywords TEXT,             -- słowa kluczowe oddzielone spacjami
+            date_created TEXT          -- data wykonania
+        )
+        '''
+    )
+    # Wyniki zapytań - które zdjęcie jest na danej pozycji strony
+    c.execute(
+        '''
+        CREATE TABLE IF NOT EXISTS query_results (
+            query_id INTEGER,      -- numer zapytania z tabeli queries
+            page INTEGER,          -- numer strony wyników
+            img_index INTEGER,     -- indeks obrazka w siatce
+            nasa_id TEXT,          -- zdjęcie z tabeli items
+            PRIMARY KEY (query_id, page, img_index)  -- unikalny klucz
+        ) WITHOUT ROWID
+        '''
+    )
+    # Metadane stron: czas pobrania i nagłówki do zapytań warunkowych
+    c.execute(
+        '''
+        CREATE TABLE IF NOT EXISTS pages (
+            query_id INTEGER,      -- numer zapytania z tabeli queries
+            page INTEGER,          -- numer strony wyników
+            fetched_at REAL,       -- czas pobrania z API (0 = nieznany)
+            etag TEXT,             -- nagłówek ETag odpowiedzi
+            last_modified TEXT,    -- nagłówek Last-Modified odpowiedzi
+            PRIMARY KEY (query_id, page)
+        ) WITHOUT ROWID
+        '''
+    )
+    global FTS
+    try:
+        # Indeks pełnotekstowy z treścią w tabeli items, aktualizowany wyzwalaczami
+        c.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5("
+            "title, description, keywords, content='items', content_rowid='rowid')"
+        )
+        c.execute(
+            'CREATE TRIGGER IF NOT EXISTS items_ai AFTER INSERT ON items BEGIN '
+            'INSERT INTO items_fts(rowid, title, description, keywords) '
+            'VALUES (new.rowid, new.title, new.description, new.keywords); END'
+        )
+        c.execute(
+            'CREATE TRIGGER IF NOT EXISTS items_ad AFTER DELETE ON items BEGIN '
+            "INSERT INTO items_fts(items_fts, rowid, title, description, keywords) "
+            "VALUES ('delete', old.rowid, old.title, old.description, old.keywords); END"
+        )
+        # Tylko przy zmianie tekstu - zapis full_url nie dotyka indeksu
+        c.execute(
+            'CREATE TRIGGER IF NOT EXISTS items_au AFTER UPDATE OF title, description, keywords ON items BEGIN '
+            "INSERT INTO items_fts(items_fts, rowid, title, description, keywords) "
+            "VALUES ('delete', old.rowid, old.title, old.description, old.keywords); "
+            'INSERT INTO items_fts(rowid, title, description, keywords) '
+            'VALUES (new.rowid, new.title, new.description, new.keywords); END'
+        )
+        FTS = True
+    except sqlite3.OperationalError as e:
+        print("Brak FTS5 w SQLite, lokalne wyszukiwanie wyłączone:", e, file=sys.stderr)
+        FTS = False
+    # Przeniesienie danych ze starych formatów - ID zdjęcia jest częścią adresu miniaturki (.../image/<nasa_id>/...)
+    if legacy_rows:
+        c.executemany(
+            'INSERT INTO items(nasa_id, thumb_url, full_url) VALUES (?,?,?) '
+            'ON CONFLICT(nasa_id) DO UPDATE SET full_url=COALESCE(items.full_url, excluded.full_url)',
+            [(thumb_url.split('/')[-2], thumb_url, full_url) for _, _, _, thumb_url, full_url in legacy_rows]
+        )
+        c.executemany(
+            'INSERT OR REPLACE INTO query_results(query_id, page, img_index, nasa_id) VALUES (?,?,?,?)',
+            [(qid, page, img_index, thumb_url.split('/')[-2]) for qid, page, img_index, thumb_url, _ in legacy_rows]
+        )
+        # Strony zapisane przed dodaniem metadanych stron traktujemy jako przeterminowane
+        c.execute('INSERT OR IGNORE INTO pages(query_id, page, fetched_at) SELECT DISTINCT query_id, page, 0 FROM query_results')
+    if columns:
+        c.execute('DROP TABLE cache')
+        print(f"Przeniesiono cache do tabel items/query_results: {len(legacy_rows)} wierszy", file=sys.stderr)
+    # Osobna tabela metadanych z wcześniejszej wersji - teraz w items
+    if c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='metadata'").fetchone():
+        c.execute(
+            'INSERT INTO items(nasa_id, thumb_url, title, description, keywords, date_created) '
+            'SELECT nasa_id, thumb_url, title, description, keywords, date_created FROM metadata WHERE true '
+            'ON CONFLICT(nasa_id) DO UPDATE SET title=excluded.title, description=excluded.description, '
+            'keywords=excluded.keywords, date_created=excluded.date_created'
+        )
+        c.execute('DROP TABLE IF EXISTS metadata_fts')
+        c.execute('DROP TABLE metadata')
+    conn.commit()  # Zapis zmian
+    global BLOBS
+    BLOBS = blob_cache.BlobCache(conn, DB_LOCK, BLOB_DIR, BLOB_MAX_BYTES)  # Magazyn bajtów zdjęć
+    return conn  # Zwrócenie połączenia do dalszego użycia
+
+# Numer zapytania w tabeli queries (dodawany, jeśli go nie ma) - przed zapisem strony
+# Wywoływane pod DB_LOCK albo przed udostępnieniem połączenia innym wątkom
+def query_id(db_conn, query):
+    key = nasa_api.normalize_query(query)
+    db_conn.execute('INSERT OR IGNORE INTO queries(text) VALUES (?)', (key,))
+    return db_conn.execute('SELECT id FROM queries WHERE text=?', (key,)).fetchone()[0]
+
+# Numer zapytania przy odczycie (bez zapisu); None, jeśli zapytania nie ma jeszcze w cache
+# Wywoływane pod DB_LOCK
+def find_query_id(db_conn, query):
+    row = db_conn.execute('SELECT id FROM queries WHERE text=?', (nasa_api.normalize_query(query),)).fetchone()
+    return row[0] if row else None
+
+# Funkcja do całkowitego wyczyszczenia bazy danych
+def clear_db(db_conn):
+    with DB_LOCK:
+        c = db_conn.cursor()
+        c.execute('DELETE FROM query_results')  # usunięcie wszystkich rekordów
+        c.execute('DELETE FROM pages')
+        c.execute('DELETE FROM queries')
+        c.execute('DELETE FROM items')  # Indeks pełnotekstowy czyszczą wyzwalacze
+        db_conn.commit()  # zapis zmian
+    print("Baza danych została wyczyszczona.")
+
+# Usunięcie wybranych stron z cache; bez argumentów usuwa wszystkie
+# Same zdjęcia (items) zostają - mogą należeć do innych zapytań i służą lokalnemu wyszukiwaniu
+# query - tylko to zapytanie, first_page/last_page - zakres stron, older_than - strony starsze niż tyle sekund
+def invalidate(db_conn, query=None, first_page=None, last_page=None, older_than=None):
+    conditions = []
+    params = []
+    if query is not None:
+        conditions.append('query_id = (SELECT id FROM queries WHERE text=?)')
+        params.append(nasa_api.normalize_query(query))
+    if first_page is not None:
+        conditions.append('page >= ?')
+        params.append(first_page)
+    if last_page is not None:
+        conditions.append('page <= ?')
+        params.append(last_page)
+    if older_than is not None:
+        conditions.append('fetched_at < ?')
+        params.append(time.time() - older_than)
+    where = ' AND '.join(conditions) or '1'
+    with DB_LOCK, db_conn:
+        keys = db_conn.execute(f'SELECT query_id, page FROM pages WHERE {where}', params).fetchall()
+        db_conn.executemany('DELETE FROM query_results WHERE query_id=? AND page=?', keys)
+        db_conn.executemany('DELETE FROM pages WHERE query_id=? AND page=?', keys)
+    print(f"Usunięto z cache stron: {len(keys)}")
+    return len(keys)
+
+# Pobranie bajtów zdjęcia - najpierw z dysku, a dopiero potem z internetu
+# on_progress/cancelled jak w http_client.download; zwraca None, jeśli pobieranie przerwano
+# stage - nazwa etapu, pod którą zapisywany jest czas pobierania (metrics)
+# Równoczesne wczytania tego samego adresu czekają na jedno pobranie i jeden zapis na dysk
+def load_image_bytes(url, on_progress=None, cancelled=None, stage='thumb_download'):
+    data = BLOBS.get(url) if BLOBS else None
+    if data is None:
+        with metrics.span(stage):
+            data = IMAGE_FLIGHTS.do(url, lambda on_progress, cancelled: _fetch_image(url, on_progress, cancelled), on_progress, cancelled)
+    return data
+
+# Pobranie zdjęcia z internetu i zapis na dysku (wykonywane raz dla równoczesnych wczytań)
+def _fetch_image(url, on_progress, cancelled):
+    data = http_client.download(url, on_progress, cancelled)  # Błędy HTTP zgłaszają wyjątek
+    if data is not None and BLOBS:
+        BLOBS.put(url, data)
+    return data
+
+# Dodanie lub aktualizacja zdjęć (słowniki z nasa_api.parse_record); ustalony full_url zostaje
+# Wywoływane pod DB_LOCK, w otwartej transakcji
+def _upsert_items(db_conn, records):
+    db_conn.executemany(
+        'INSERT INTO items(nasa_id,thumb_url,title,description,keywords,date_created) VALUES (?,?,?,?,?,?) '
+        'ON CONFLICT(nasa_id) DO UPDATE SET thumb_url=excluded.thumb_url, title=excluded.title, '
+        'description=excluded.description, keywords=excluded.keywords, date_created=excluded.date_created',
+        [(rec['nasa_id'], rec['thumb_url'], rec['title'], rec['description'], ' '.join(rec['keywords']), rec['date_created'])
+         for rec in records]
+    )
+
+# Zapis całej strony wyników w jednej transakcji
+# Zwraca znane już adresy pełnych zdjęć tej strony (nasa_id -> full_url), np. z innych zapytań
+def save_page(db_conn, qid, page, records, etag=None, last_modified=None):
+    with metrics.span('cache_write'), DB_LOCK, db_conn:
+        _upsert_items(db_conn, records)
+        db_conn.execute('DELETE FROM query_results WHERE query_id=? AND page=?', (qid, page))  # Nowa strona może być krótsza
+        db_conn.execute(
+            'INSERT OR REPLACE INTO pages(query_id,page,fetched_at,etag,last_modified) VALUES (?,?,?,?,?)',
+            (qid, page, time.time(), etag, last_modified)
+        )
+        db_conn.executemany(
+            'INSERT OR REPLACE INTO query_results(query_id,page,img_index,nasa_id) VALUES (?,?,?,?)',
+            [(qid, page, i, rec['nasa_id']) for i, rec in enumerate(records)]
+        )
+        return dict(db_conn.execute(
+            'SELECT i.nasa_id, i.full_url FROM query_results q JOIN items i ON i.nasa_id = q.nasa_id '
+            'WHERE q.query_id=? AND q.page=? AND i.full_url IS NOT NULL',
+            (qid, page)
+        ).fetchall())
+
+# Zapis zdjęć bez przypisania do strony (np. reszta strony API) - trafiają do lokalnego indeksu
+def save_items(db_conn, records):
+    with metrics.span('cache_write'), DB_LOCK, db_conn:
+        _upsert_items(db_conn, records)
+
+# Wyszukiwanie w metadanych zapisanych wcześniej zdjęć (bez internetu)
+# Każde słowo zapytania musi wystąpić (także jako początek słowa); wyniki od najlepiej pasujących
+# Zwraca listę (nasa_id, thumb_url, full_url)
+def local_search(db_conn, query, limit, offset=0):
+    words = re.findall(r'\w+', nasa_api.normalize_query(query))
+    if not FTS or not words:
+        return []
+    match = ' '.join(f'"{word}"*' for word in words)
+    with metrics.span('local_search'), DB_LOCK:
+        return db_conn.execute(
+            'SELECT i.nasa_id, i.thumb_url, i.full_url FROM items_fts JOIN items i ON i.rowid = items_fts.rowid '
+            'WHERE items_fts MATCH ? ORDER BY bm25(items_fts) LIMIT ? OFFSET ?',
+            (match, limit, offset)
+        ).fetchall()
+
+# Zapis adresów pełnych zdjęć (lista (nasa_id, full_url)) w jednej transakcji
+def save_full_urls(db_conn, resolved):
+    with metrics.span('cache_write'), DB_LOCK, db_conn:
+        db_conn.executemany('UPDATE items SET full_url=? WHERE nasa_id=?', [(full_url, nasa_id) for nasa_id, full_url in resolved])
+
+# Strona wyników z cache: (numer zapytania, wiersze (img_index, nasa_id, thumb_url, full_url), czas pobrania)
+# Sam odczyt - zapytania, którego nie ma w cache, nie dodaje (numer i czas pobrania to wtedy None)
+def read_page(db_conn, query, page):
+    with metrics.span('cache_read'), DB_LOCK:
+        qid = find_query_id(db_conn, query)  # "Mars", "mars " i "MARS" mają ten sam numer
+        if qid is None:
+            return None, [], None
+        rows = db_conn.execute(
+            'SELECT q.img_index, i.nasa_id, i.thumb_url, i.full_url FROM query_results q '
+            'JOIN items i ON i.nasa_id = q.nasa_id WHERE q.query_id=? AND q.page=? ORDER BY q.img_index',
+            (qid, page)
+        ).fetchall()
+        fetched_at = db_conn.execute('SELECT fetched_at FROM pages WHERE query_id=? AND page=?', (qid, page)).fetchone()
+    return qid, rows, fetched_at[0] if fetched_at else None
+
+# Czy stronę pobraną o czasie fetched_at trzeba odświeżyć (None - nie wiadomo, kiedy ją pobrano)
+def is_stale(fetched_at):
+    return fetched_at is None or time.time() - fetched_at > CACHE_TTL
+
+# Pobranie strony wyników z API (api_base) i zapis w cache; qid None - zapytanie jeszcze niezapisane
+# Zwraca (wyniki, znane już adresy pełnych zdjęć: nasa_id -> full_url); błąd połączenia przechodzi do wywołującego
+def fetch_page(db_conn, api_base, query, qid, page, page_size=PAGE_SIZE):
+    # Strona siatki może obejmować fragment strony API - wyniki z reszty nie przepadają
+    records, r = nasa_api.results_page(api_base, query, page, page_size)
+    if qid is None:
+        with DB_LOCK, db_conn:
+            qid = query_id(db_conn, query)  # Pierwsza zapisywana strona tego zapytania
+    known = save_page(db_conn, qid, page, records, r.headers.get('ETag'), r.headers.get('Last-Modified'))
+    return records, known
+
+# Ustalenie adresów pełnych zdjęć dla listy (indeks, nasa_id, thumb_url) i zapis w cache
+# Adresy są zapisywane razem po ostatniej odpowiedzi; on_resolved(indeks, full_url) - np. uzupełnienie kafelka
+def resolve_full_urls(db_conn, pending, on_resolved=None):
+    ids = {index: nasa_id for index, nasa_id, _ in pending}
+    resolved = []
+    lock = threading.Lock()
+    def on_url(index, full_url):
+        if on_resolved is not None:
+            on_resolved(index, full_url)
+        with lock:
+            resolved.append((ids[index], full_url))
+            if len(resolved) < len(pending):
+                return
+        save_full_urls(db_conn, resolved)
+    return nasa_api.resolve_full_urls(pending, on_url)
+
+_refreshing = set()  # Strony odświeżane w tle (query_id, page)
+_refreshing_lock = threading.Lock()
+
+# Odświeżenie przeterminowanej strony zapytaniem warunkowym (ETag / Last-Modified)
+def refresh_page(db_conn, api_base, query, qid, page, page_size=PAGE_SIZE):
+    try:
+        with DB_LOCK:
+            etag, last_modified = db_conn.execute(
+                'SELECT etag, last_modified FROM pages WHERE query_id=? AND page=?', (qid, page)
+            ).fetchone() or (None, None)
+            old_thumbs = [row[0] for row in db_conn.execute(
+                'SELECT i.thumb_url FROM query_results q JOIN items i ON i.nasa_id = q.nasa_id '
+                'WHERE q.query_id=? AND q.page=? ORDER BY q.img_index', (qid, page)
+            )]
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        records, r = nasa_api.results_page(api_base, query, page, page_size, headers)
+        if records is None or [rec['thumb_url'] for rec in records] == old_thumbs:
+            # Bez zmian - przedłużamy ważność, adresy pełnych zdjęć zostają
+            with DB_LOCK, db_conn:
+                db_conn.execute(
+                    'UPDATE pages SET fetched_at=?, etag=?, last_modified=? WHERE query_id=? AND page=?',
+                    (time.time(), r.headers.get('ETag', etag), r.headers.get('Last-Modified', last_modified), qid, page)
+                )
+            return
+        known = save_page(db_conn, qid, page, records, r.headers.get('ETag'), r.headers.get('Last-Modified'))
+        resolve_full_urls(db_conn, [(i, rec['nasa_id'], rec['thumb_url']) for i, rec in enumerate(records) if rec['nasa_id'] not in known])
+        print(f"Odświeżono stronę w cache: {query}, strona {page}")
+    except Exception as e:
+        print("Błąd odświeżania strony:", e)
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard((qid, page))
+
+# Zlecenie odświeżenia strony w tle (najwyżej jedno naraz dla tej samej strony)
+def schedule_refresh(db_conn, api_base, query, qid, page, page_size=PAGE_SIZE):
+    with _refreshing_lock:
+        if (qid, page) in _refreshing:
+            return
+        _refreshing.add((qid, page))
+    nasa_api.get_executor().submit(refresh_page, db_conn, api_base, query, qid, page, page_size)
@@ -4,21 +4,17 @@ import tkinter as tk
 from tkinter import ttk
 from PIL import Image, ImageTk
 from io import BytesIO
+from itertools import islice
+from urllib.parse import urlencode
 import webbrowser
+import nasa_api
 
+NUM_IMAGES = 5 # Liczba wyświetlanych zdjęć
+
+# Kolejne wyniki wyszukiwania (następne strony API pobierane dopiero, gdy są potrzebne)
 def Fetch_Nasa_Images(query):
-    url = "https://images-api.nasa.gov/search"
-    
-    params_q = {
-        'q': query
-    }
-    
-    response = requests.get(url, params=params_q)
-    
-    if response.status_code == 200:
-        return response.json()
-    else:
-        raise Exception(f'Nie udało się pobrać danych, kod błędu {response.status_code}')
+    url = "https://images-api.nasa.gov/search?" + urlencode({'q': query})
+    return nasa_api.iter_results(url) # Błąd pobierania zgłaszany jest przy odczycie wyników
 
 # Funkcja otwierająca obraz w przeglądarce
 def open_image(url):
@@ -26,36 +22,30 @@ def open_image(url):
 
 def display_images(query):
     try:
-        data = Fetch_Nasa_Images(query) # Pobranie danych z API
-        items = data.get('collection', {}).get('items', []) # Pobranie listy wyników
+        records = list(islice(Fetch_Nasa_Images(query), NUM_IMAGES)) # Pierwsze wyniki z miniaturką (także z kolejnych stron API)
         
-        if not items:
+        if not records:
             result_label.config(text="Brak wyników wyszukiwania")
             return
         
         for widget in frame.winfo_children():  # Czyści poprzednie wyniki
             widget.destroy()
         
-        for item in items[:5]:
-            item_data = item.get('data', [])
-            title = item_data[0].get("title", "Brak tytułu")
+        for record in records:
+            title = record['title'] or "Brak tytułu"
+            href = record['thumb_url']
+            response = requests.get(href)
+            img = Image.open(BytesIO(response.content))
+            img.thumbnail((200, 200))
+            img = ImageTk.PhotoImage(img)
             
-            links = item.get('links', [])
-            if links:
-                href = links[0].get('href', '')
-                if href:
-                    response = requests.get(href)
-                    img = Image.open(BytesIO(response.content))
-                    img.thumbnail((200, 200))
-                    img = ImageTk.PhotoImage(img)
-                    
-                    panel = tk.Label(frame, image=img, cursor="hand2")
-                    panel.image = img
-                    panel.bind("<Button-1>", lambda e, url=href: open_image(url))
-                    panel.pack(pady=5)
-                    
-                    title_label = tk.Label(frame, text=title, wraplength=200)
-                    title_label.pack()
+            panel = tk.Label(frame, image=img, cursor="hand2")
+            panel.image = img
+            panel.bind("<Button-1>", lambda e, url=href: open_image(url))
+            panel.pack(pady=5)
+            
+            title_label = tk.Label(frame, text=title, wraplength=200)
+            title_label.pack()
                     
     except Exception as e:
         result_label.config(text=f"Wystąpił błąd: {e}")
@@ -1,112 +1,182 @@
 import pygame
-import requests
+import http_client
 import io
 import sys
-import threading
+import time
+import nasa_api
+import loader_pool
+import scroll_grid
+import full_image
+import frame_stats
+import surface_cache
+import metrics
+import redraw
 
 API_BASE = "https://images-api.nasa.gov/search?media_type=image" # Link do strony NASA z której pobieramy zdjęcia
-THUMB_SIZE = (160, 120) # Rozmiar miniaturki
-GRID_COLS = 4 # Liczba kolumn
-GRID_ROWS = 5 # Liczba wierszy
-NUM_IMAGES = GRID_COLS * GRID_ROWS # Łączna liczba zdjęć na stronie
+THUMB_SIZE = (160, 120) # Rozmiar miniaturki przy skali 1
+THUMB_SCALE = 1.0 # Skala miniaturek (np. 2 na ekranach HiDPI), zmieniana klawiszami +/-
+THUMB_SCALES = (0.5, 3.0) # Najmniejsza i największa skala
+GRID_COLS = 4 # Liczba kolumn okna startowego (w oknie o innym rozmiarze wynika z szerokości)
+GRID_ROWS = 5 # Liczba wierszy okna startowego
+NUM_IMAGES = GRID_COLS * GRID_ROWS # Liczba zdjęć pobieranych naraz (jedna strona wyników)
 PADDING = 10 # Odstępy między zdjęciami
-WINDOW_SIZE = (GRID_COLS * (THUMB_SIZE[0] + PADDING) + PADDING, # Obliczenie wielkości okna
-               GRID_ROWS * (THUMB_SIZE[1] + PADDING) + PADDING + 40)
+INFO_HEIGHT = 40 # Wysokość paska z informacjami
+WINDOW_SIZE = (GRID_COLS * (THUMB_SIZE[0] + PADDING) + PADDING, # Startowa wielkość okna (można ją zmieniać)
+               GRID_ROWS * (THUMB_SIZE[1] + PADDING) + PADDING + INFO_HEIGHT)
+SCROLL_STEP = 60 # Przewinięcie o jeden ząbek kółka myszy (w pikselach)
 FPS = 30
 
 QUERY = "" # Domyślne zapytanie
 
 # Klasa reprezentująca pojedyncze zdjęcie
+# Miejsce kafelka w oknie wynika z indeksu wyniku (scroll_grid.GridLayout)
 class ImageTile:
-    def __init__(self, thumb_url, full_url, position):
+    def __init__(self, thumb_url, full_url, generation=None, priority=loader_pool.PRIORITY_VISIBLE, size=THUMB_SIZE):
         self.thumb_url = thumb_url # URL miniaturki
         self.full_url = full_url # URL zdjęcia
-        self.position = position # Pozycja zdjęcia w oknie
-        self.thumb_surface = self.get_placeholder() # Placeholder
-        self.loaded = False # Sprawdza czy zdjęcie zostało załadowane
-        threading.Thread(target=self.async_load_thumbnail, daemon=True).start() # Asynchroniczne wczytywanie zdjęć
+        self.size = size # Rozmiar miniaturki na ekranie
+        cached = surface_cache.get_cache().get(thumb_url, size) # Miniaturka zdekodowana wcześniej
+        self.thumb_surface = cached # Miniaturka (None - jeszcze niewczytana albo zwolniona)
+        self.loaded = cached is not None # Sprawdza czy zdjęcie zostało załadowane
+        self.generation = generation # Pokolenie strony, dla której powstał kafelek
+        self.priority = priority # Priorytet zadania w puli
+        if not self.loaded:
+            loader_pool.get_pool().submit(self.async_load_thumbnail, priority, generation) # Wczytywanie zdjęć we wspólnej puli
 
     # Placeholder
     def get_placeholder(self):
-        surface = pygame.Surface(THUMB_SIZE)
-        surface.fill((100, 100, 100))
+        surface = pygame.Surface(self.size)
+        surface.fill(scroll_grid.PLACEHOLDER_COLOR)
         return surface
+
+    # Zlecenie wczytania miniaturki w nowym pokoleniu (np. kafelek wrócił na ekran) lub w nowym rozmiarze
+    def schedule(self, generation, priority, size=None):
+        if size is not None and size != self.size:
+            self.size = size
+            self.thumb_surface = None
+            self.loaded = False
+            self.generation = None
+        if self.loaded or (self.generation == generation and self.priority <= priority):
+            return
+        cached = surface_cache.get_cache().get(self.thumb_url, self.size)
+        if cached is not None:
+            self.thumb_surface = cached
+            self.loaded = True
+            return
+        self.generation = generation
+        self.priority = priority
+        loader_pool.get_pool().submit(self.async_load_thumbnail, priority, generation)
+
+    # Oddanie miniaturki kafelka, który zjechał z ekranu
+    def release(self):
+        self.thumb_surface = None
+        self.loaded = False
+        self.generation = None
+
     # Ładowanie miniaturek
     def async_load_thumbnail(self):
+        if self.loaded:
+            return # Zadanie zlecone ponownie, a miniaturka jest już gotowa
+        size = self.size
         try:
-            response = requests.get(self.thumb_url, timeout=10) # Pobiera miniaturkę z internetu
+            with metrics.span('thumb_download'):
+                response = http_client.get(self.thumb_url, timeout=10) # Pobiera miniaturkę z internetu
+            if not loader_pool.get_pool().is_current(self.generation):
+                return # Kafelek zjechał z ekranu w trakcie pobierania - nie dekodujemy
             image_bytes = io.BytesIO(response.content) # Tworzy obiekt ze zdjęcia
-            image = pygame.image.load(image_bytes) # Wczytuje zdjęcie do Pygame
-            self.thumb_surface = pygame.transform.scale(image, THUMB_SIZE) # Skaluje do THUMB_SIZE
+            with metrics.span('decode'):
+                image = pygame.image.load(image_bytes) # Wczytuje zdjęcie do Pygame
+            with metrics.span('scale'):
+                surface = pygame.transform.scale(image, size) # Skaluje do rozmiaru kafelka
+            surface_cache.get_cache().put(self.thumb_url, size, surface)
+            if size != self.size:
+                return # W międzyczasie zmieniono rozmiar miniaturek
+            self.thumb_surface = surface
             self.loaded = True
+            redraw.notify(self) # Pętla odświeży tylko ten kafelek
         except Exception as e:
             print("Nie udało się wczytać miniaturki:", e) # Wiadomość w konsoli w wypadku błędu
 
-    # Ładowanie zdjęć
-    def load_full_image(self):
+    # Ładowanie zdjęć (wywoływane w tle przez FullImageJob)
+    def load_full_image(self, screen_size, on_progress=None, cancelled=None):
+        cache = surface_cache.get_cache()
+        surface = cache.get(self.full_url, screen_size) # Zdjęcie otwierane już wcześniej
+        if surface is not None:
+            return surface
         try:
-            response = requests.get(self.full_url, timeout=10) # Pobiera zdjęcia
-            image_bytes = io.BytesIO(response.content) # Konwertuje na bajty
-            img = pygame.image.load(image_bytes) # Wczytuje zdjęcie do Pygame
-            screen_w, screen_h = pygame.display.get_surface().get_size() # Pobiera rozmiar okna
-            img_rect = img.get_rect()
-            scale = min(screen_w / img_rect.width, screen_h / img_rect.height)
-            new_size = (int(img_rect.width * scale), int(img_rect.height * scale))
-            return pygame.transform.scale(img, new_size) # Skaluje zdjęcie
+            with metrics.span('full_download'):
+                image_data = http_client.download(self.full_url, on_progress, cancelled) # Pobiera zdjęcia porcjami
         except Exception as e:
-            print("Błąd przy wczytywaniu zdjęcia:", e) # Wiadomość w konsoli w wypadku błędu
-            return None
+            if not nasa_api.is_missing(e) or self.full_url != nasa_api.derive_full_url(self.thumb_url):
+                raise
+            # Adresu wyprowadzonego z miniaturki nie ma na serwerze - ustalamy go przez /asset
+            self.full_url = nasa_api.fallback_full_url(self.thumb_url.split('/')[-2], self.thumb_url)
+            with metrics.span('full_download'):
+                image_data = http_client.download(self.full_url, on_progress, cancelled)
+        if image_data is None:
+            return None # Przerwane przez użytkownika
+        with metrics.span('decode'):
+            img = pygame.image.load(io.BytesIO(image_data)) # Wczytuje zdjęcie do Pygame
+        with metrics.span('scale'):
+            surface = pygame.transform.scale(img, full_image.fit_size(img.get_size(), screen_size)) # Skaluje zdjęcie
+        cache.put(self.full_url, screen_size, surface)
+        return surface
+
+    # Otwarcie zdjęcia bez blokowania pętli - najpierw pokazuje powiększoną miniaturkę
+    def open_full_image(self, screen_size):
+        return full_image.FullImageJob(
+            self.thumb_surface or self.get_placeholder(), screen_size,
+            lambda on_progress, cancelled: self.load_full_image(screen_size, on_progress, cancelled)
+        )
 
 # Funkcja pobierająca zdjęcia
-def fetch_nasa_images(query, page=1):
-    url = f"{API_BASE}&q={query}&page={page}" # Tworzy URL zapytania
-    print("Fetching:", url)
-    try:
-        r = requests.get(url, timeout=10) # Wysyła żądanie do API
-        data = r.json()
-    except Exception as e:
-        print("Błąd przy pobieraniu danych:", e) # Wiadomość w konsoli w wypadku błędu
-        return []
-
-    items = data.get("collection", {}).get("items", []) # Pobiera listę elementów
+# generation/priority - pokolenie i priorytet ładowania miniaturek (domyślnie nowe pokolenie, strona widoczna)
+# size - rozmiar miniaturek na ekranie
+# on_end(count) - wywoływane, gdy wyniki skończyły się na tej stronie (count wyników)
+# Błąd pobierania przechodzi do wywołującego (siatka ponowi pobranie strony)
+def fetch_nasa_images(query, page=1, generation=None, priority=loader_pool.PRIORITY_VISIBLE, size=THUMB_SIZE, on_end=None):
+    print(f"Fetching: {query}, strona {page}")
+    records, _ = nasa_api.results_page(API_BASE, query, page, NUM_IMAGES) # Wyniki tej strony siatki
+
     tiles = [] # Lista zdjęć
-    count = 0 # Licznik zdjęć
-    for item in items:
-        if count >= NUM_IMAGES:
-            break
-        links = item.get("links", []) # Pobiera miniaturkę
-        if links:
-            thumb_url = links[0].get("href") # URL miniaturki
-            nasa_id = item.get("data", [{}])[0].get("nasa_id") # ID zdjęcia
-            asset_url = f"https://images-api.nasa.gov/asset/{nasa_id}" # link do danych
-            try:
-                asset_response = requests.get(asset_url, timeout=10) # Pobiera dane
-                asset_data = asset_response.json()
-                full_url = thumb_url
-                for url_candidate in asset_data.get("collection", {}).get("items", []):
-                    candidate_href = url_candidate.get("href", "")
-                    if candidate_href.lower().endswith(".jpg"): # Wybiera pierwsze zdjęcie
-                        full_url = candidate_href
-                        break
-            except Exception:
-                full_url = thumb_url
-
-            col = count % GRID_COLS     # Oblicza kolumnę
-            row = count // GRID_COLS    # Oblicza wiersz
-            x = PADDING + col * (THUMB_SIZE[0] + PADDING)
-            y = PADDING + row * (THUMB_SIZE[1] + PADDING)
-            tile = ImageTile(thumb_url, full_url, (x, y)) # Tworzy kafelek
-            tiles.append(tile) # Dodaje go do listy
-            count += 1
+    if generation is None:
+        generation = loader_pool.get_pool().new_generation() # Anuluje ładowanie miniaturek poprzedniej strony
+    pending = [] # Zdjęcia czekające na adres pełnego pliku
+    for count, rec in enumerate(records):
+        thumb_url = rec['thumb_url'] # URL miniaturki
+        tile = ImageTile(thumb_url, thumb_url, generation, priority, size) # Tworzy kafelek (do czasu ustalenia pełnego zdjęcia używa miniaturki)
+        tiles.append(tile) # Dodaje go do listy
+        pending.append((count, rec['nasa_id'], thumb_url))
+
+    # Pełne adresy zdjęć: zwykle od razu z adresu miniaturki, w pozostałych przypadkach równolegle w tle
+    def on_resolved(index, full_url):
+        tiles[index].full_url = full_url
+    nasa_api.resolve_full_urls(pending, on_resolved)
 
+    if len(records) < NUM_IMAGES and on_end is not None:
+        on_end(len(records)) # Ostatnia strona wyników
     return tiles
 
+# Układ siatki dla okna o rozmiarze view_size i skali miniaturek scale
+def grid_layout(view_size, scale):
+    size = (round(THUMB_SIZE[0] * scale), round(THUMB_SIZE[1] * scale))
+    return scroll_grid.GridLayout(view_size, size, PADDING, INFO_HEIGHT)
+
+# Przewijana siatka wyników zapytania (strony wokół ekranu pobierane w tle)
+def make_grid(query, layout):
+    return scroll_grid.ScrollGrid(
+        lambda page, generation, priority, size, on_end: fetch_nasa_images(query, page, generation, priority, size, on_end),
+        NUM_IMAGES, layout
+    )
+
 # Ekran wprowadzania zapytania przez użytkownika
 def search_input_screen():
     global QUERY
-    pygame.init()
+    pygame.display.init() # Tylko obraz i czcionki - bez dźwięku i joysticków (krótszy start)
+    pygame.font.init()
     screen = pygame.display.set_mode((600, 200)) # Tymczasowe okno
     pygame.display.set_caption("Wpisz frazę wyszukiwania NASA")
+    http_client.prepare() # Biblioteka HTTP ładuje się w tle, gdy użytkownik pisze
     clock = pygame.time.Clock()
     font = pygame.font.SysFont(None, 36)
 
@@ -154,62 +224,129 @@ def search_input_screen():
 def main():
     global QUERY
     search_input_screen() # Ekran z wpisywaniem zapytania
-    screen = pygame.display.set_mode(WINDOW_SIZE) # Główne okno
+    screen = pygame.display.set_mode(WINDOW_SIZE, pygame.RESIZABLE) # Główne okno (rozmiar można zmieniać)
     pygame.display.set_caption("Wyszukiwarka zdjęć NASA")
     clock = pygame.time.Clock()
     font = pygame.font.SysFont(None, 24)
 
-    current_page = 1 # Strona początkowa
-    tiles = fetch_nasa_images(QUERY, current_page) # Pobiera pierwszą stronę zdjęć
-    fullscreen_image = None # Sprawdza czy zdjęcie jest powiększone
+    scale = THUMB_SCALE # Skala miniaturek (klawisze +/-)
+    grid = make_grid(QUERY, grid_layout(screen.get_size(), scale)) # Wyniki przewijane bez podziału na strony
+    fullscreen_image = None # Powiększane zdjęcie (FullImageJob)
+    frames = frame_stats.FrameHistogram() # Czasy klatek (od zdarzenia do odświeżenia ekranu)
+    overlay = False # Nakładka z czasami etapów (klawisz m)
+    overlay_font = pygame.font.SysFont('monospace', 14)
+    info_label = redraw.TextCache(font, (255, 255, 255)) # Pasek z informacjami renderowany tylko po zmianie
+    dirty = redraw.DirtyRects() # Obszary do odświeżenia
+    changed = [] # Kafelki z nowo wczytaną miniaturką
 
     running = True
     while running:
-        clock.tick(FPS)
-        for event in pygame.event.get():
+        # Bez zmian pętla śpi; klatki co 1/FPS tylko przy pasku postępu lub nakładce
+        animating = overlay or (fullscreen_image is not None and not fullscreen_image.done)
+        events = redraw.wait_events(animating, FPS)
+        frame_start = time.perf_counter()
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type == redraw.REDRAW:
+                if event.tile is None:
+                    dirty.all()
+                elif event.tile in grid.shown:
+                    changed.append(event.tile) # Miniaturki spoza ekranu (margines) nie są widoczne
+            elif event.type in redraw.EXPOSE_EVENTS:
+                dirty.all()
+            elif event.type == pygame.VIDEORESIZE:
+                screen = pygame.display.get_surface()
+                grid.set_layout(grid_layout(screen.get_size(), scale)) # Liczba kolumn wynika z nowej szerokości
+                dirty.all()
+            elif event.type == pygame.MOUSEWHEEL and fullscreen_image is None:
+                grid.scroll_by(-event.y * SCROLL_STEP)
+                dirty.all()
             elif event.type == pygame.KEYDOWN:
+                dirty.all()
                 if event.key == pygame.K_q: # Wyjście za pomocą q
                     running = False
-                elif event.key == pygame.K_n and fullscreen_image is None: # Następna strona
-                    current_page += 1
-                    tiles = fetch_nasa_images(QUERY, current_page)
-                elif event.key == pygame.K_b and current_page > 1 and fullscreen_image is None: # Poprzednia strona
-                    current_page -= 1
-                    tiles = fetch_nasa_images(QUERY, current_page)
-                elif event.key == pygame.K_ESCAPE and fullscreen_image is not None:
-                    fullscreen_image = None # Zamknięcie powiększonego zdjęcia
-                elif event.key == pygame.K_r and fullscreen_image is None: # Nowe wyszukiwanie
+                elif event.key == pygame.K_m: # Nakładka z czasami etapów
+                    overlay = not overlay
+                elif fullscreen_image is not None:
+                    if event.key == pygame.K_ESCAPE:
+                        fullscreen_image.cancel() # Przerywa pobieranie, jeśli jeszcze trwa
+                        fullscreen_image = None # Zamknięcie powiększonego zdjęcia
+                elif event.key in (pygame.K_n, pygame.K_PAGEDOWN): # Ekran w dół
+                    grid.scroll_by(grid.layout.view.height)
+                elif event.key in (pygame.K_b, pygame.K_PAGEUP): # Ekran w górę
+                    grid.scroll_by(-grid.layout.view.height)
+                elif event.key == pygame.K_DOWN: # Wiersz w dół
+                    grid.scroll_by(grid.layout.cell_h)
+                elif event.key == pygame.K_UP: # Wiersz w górę
+                    grid.scroll_by(-grid.layout.cell_h)
+                elif event.key == pygame.K_HOME: # Początek wyników
+                    grid.scroll_by(-grid.scroll)
+                elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS, pygame.K_MINUS, pygame.K_KP_MINUS): # Rozmiar miniaturek
+                    step = 1.25 if event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS) else 0.8
+                    scale = min(max(THUMB_SCALES[0], scale * step), THUMB_SCALES[1])
+                    grid.set_layout(grid_layout(screen.get_size(), scale))
+                elif event.key == pygame.K_r: # Nowe wyszukiwanie
+                    size = screen.get_size()
                     search_input_screen()
-                    screen = pygame.display.set_mode(WINDOW_SIZE)
-                    current_page = 1
-                    tiles = fetch_nasa_images(QUERY, current_page)
+                    screen = pygame.display.set_mode(size, pygame.RESIZABLE)
+                    grid = make_grid(QUERY, grid_layout(size, scale)) # Nowe zapytanie - nowa siatka
 
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if fullscreen_image is None and event.button == 1:
-                    mouse_pos = event.pos
-                    for tile in tiles:
-                        thumb_rect = pygame.Rect(tile.position, THUMB_SIZE)
-                        if thumb_rect.collidepoint(mouse_pos):
-                            full_img = tile.load_full_image() # Powiększanie zdjęciu
-                            if full_img:
-                                fullscreen_image = full_img
-                            break
+                    tile = grid.tile_at(event.pos) # Kafelek pod kursorem
+                    if tile is not None:
+                        fullscreen_image = tile.open_full_image(screen.get_size()) # Powiększanie zdjęcia w tle
+                        dirty.all()
+        grid.update() # Strony i miniaturki wokół ekranu
+        if fullscreen_image is not None and fullscreen_image.failed:
+            fullscreen_image = None # Nie udało się wczytać - powrót do siatki
+            dirty.all()
+        if animating:
+            dirty.all() # Pasek postępu i nakładka zmieniają się w każdej klatce
+        render_start = time.perf_counter()
+        width, height = screen.get_size()
         if fullscreen_image:
-            screen.fill((0, 0, 0))
-            img_rect = fullscreen_image.get_rect(center=screen.get_rect().center)
-            screen.blit(fullscreen_image, img_rect)
+            if dirty.everything:
+                screen.fill((0, 0, 0))
+                img_rect = fullscreen_image.surface.get_rect(center=screen.get_rect().center)
+                screen.blit(fullscreen_image.surface, img_rect)
+                fullscreen_image.draw_progress(screen) # Postęp pobierania
         else:
-            screen.fill((50, 50, 50))
-            info = f"Zapytanie: {QUERY} | n: dalej, b: wstecz, r: wyszukaj, q: wyjście, ESC: zamknij zdjęcie)"
-            page_text = font.render(info, True, (255, 255, 255))
-            screen.blit(page_text, (PADDING, WINDOW_SIZE[1] - 30)) # Pasek z informacjami
-            for tile in tiles:
-                screen.blit(tile.thumb_surface, tile.position) # Miniaturki
+            if dirty.everything:
+                grid.draw(screen) # Widoczne miniaturki
+            else:
+                for tile in changed:
+                    rect = grid.draw_tile(screen, tile) # Tylko nowo wczytane miniaturki
+                    if rect is not None:
+                        dirty.add(rect)
+            info = f"Zapytanie: {QUERY} | wyniki {grid.visible_text()} | kółko/strzałki/n/b: przewijanie, +/-: rozmiar, r: wyszukaj, q: wyjście, m: czasy, ESC: zamknij zdjęcie | {surface_cache.get_cache().info_text()}"
+            page_text, text_changed = info_label.render(info)
+            if text_changed or dirty.everything:
+                info_rect = pygame.Rect(0, height - INFO_HEIGHT, width, INFO_HEIGHT)
+                screen.fill((50, 50, 50), info_rect)
+                screen.blit(page_text, (PADDING, height - 30)) # Pasek z informacjami
+                dirty.add(info_rect)
+        changed = []
+        if overlay:
+            metrics.draw_overlay(screen, overlay_font, clock.get_fps()) # p50/p95 etapów i FPS
 
-        pygame.display.flip() # Odświeżenie ekranu
+        if not dirty:
+            continue # Nic się nie zmieniło (np. ruch myszy)
+        dirty.update() # Odświeżenie zmienionych obszarów ekranu
+        metrics.observe('render', time.perf_counter() - render_start)
+        frames.add(1000 * (time.perf_counter() - frame_start))
+        clock.tick(FPS) # Najwyżej FPS klatek na sekundę, także przy serii wczytanych miniaturek
 
+    print("Statystyki połączeń:", http_client.timing_summary()) # Czasy DNS, łączenia, TLS i transferu
+    print("Łączenie zapytań:", http_client.coalescing_stats()) # Pobrania wspólne dla kilku wywołań
+    if http_client.archive_stats() is not None:
+        print("Archiwum HTTP:", http_client.archive_stats()) # Nagrane albo odtworzone odpowiedzi
+    print("Statystyki puli miniaturek:", loader_pool.get_pool().stats()) # Kolejka i pominięte zadania
+    print("Statystyki siatki:", grid.stats()) # Strony i miniaturki trzymane w pamięci
+    print("Czasy klatek:", frames.summary()) # Histogram czasów klatek
+    print("Statystyki adresów zdjęć:", nasa_api.resolution_stats()) # Jak często adres z miniaturki wystarczył
+    print("Czasy etapów:", metrics.get_registry().to_json()) # p50/p95 pobierania, dekodowania i rysowania
     pygame.quit() # Zamyka pygame
     sys.exit() # Kończy program
 
@@ -0,0 +1,62 @@
+import pygame
+
+# Rysowanie na żądanie: okno jest odświeżane tylko po zmianie (wczytana miniaturka, klawisz, nowa strona),
+# a bez zmian pętla śpi w pygame.event.wait zamiast rysować FPS razy na sekundę
+# Wątki tła zgłaszają zmiany przez notify(), pętla zbiera zmienione obszary w DirtyRects
+
+REDRAW = pygame.event.custom_type() # Zdarzenie "trzeba odświeżyć" (atrybut tile: kafelek albo None - całe okno)
+EXPOSE_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED) # Okno odsłonięte - trzeba narysować je od nowa
+
+# Zgłoszenie zmiany z dowolnego wątku; tile - kafelek z nową miniaturką, None - całe okno
+def notify(tile=None):
+    try:
+        pygame.event.post(pygame.event.Event(REDRAW, tile=tile))
+    except pygame.error:
+        pass  # Brak okna (np. pomiary bez pętli) - nie ma czego odświeżać
+
+# Zdarzenia do obsłużenia w tej klatce
+# Bez animacji czeka bez limitu czasu (zero pracy w bezczynności), z animacją najwyżej do następnej klatki
+def wait_events(animating, fps):
+    event = pygame.event.wait(1000 // fps if animating else 0)
+    events = [event] if event.type != pygame.NOEVENT else []
+    return events + pygame.event.get()  # Wszystkie zaległe zdarzenia obsługujemy w jednej klatce
+
+# Obszary okna zmienione w bieżącej klatce
+class DirtyRects:
+    def __init__(self):
+        self.rects = []
+        self.everything = True # Całe okno (pierwsza klatka, zmiana strony, pełny ekran)
+
+    def add(self, rect):
+        self.rects.append(rect)
+
+    def all(self):
+        self.everything = True
+
+    def __bool__(self):
+        return self.everything or bool(self.rects)
+
+    # Wysłanie zmian na ekran - całego okna tylko wtedy, gdy zostało narysowane od nowa
+    def update(self):
+        if self.everything:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.rects)
+        self.rects = []
+        self.everything = False
+
+# Napis renderowany ponownie tylko po zmianie tekstu
+class TextCache:
+    def __init__(self, font, color):
+        self.font = font
+        self.color = color
+        self.text = None
+        self.surface = None
+
+    # Zwraca (powierzchnia, czy tekst się zmienił)
+    def render(self, text):
+        if text == self.text:
+            return self.surface, False
+        self.text = text
+        self.surface = self.font.render(text, True, self.color)
+        return self.surface, True
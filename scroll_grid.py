@@ -0,0 +1,261 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pygame
+import loader_pool
+import redraw
+
+MARGIN_ROWS = 2 # Najmniejszy margines: ile wierszy nad i pod ekranem trzyma miniaturki (przewijanie bez szarych pól)
+MEMORY_BUDGET = 32 * 1024 * 1024 # Limit pamięci na miniaturki wierszy marginesu (w bajtach)
+BYTES_PER_PIXEL = 4 # Szacunek pamięci powierzchni pygame (RGBA)
+PLACEHOLDER_COLOR = (100, 100, 100) # Kolor pola, którego miniaturka nie jest jeszcze wczytana
+BACKGROUND = (50, 50, 50) # Kolor tła siatki
+RETRY_DELAY = 2.0 # Po ilu sekundach ponawiamy pobranie strony, które się nie udało
+
+# Układ siatki wyliczany z indeksu wyniku (bez listy pozycji)
+# Liczba kolumn zależy od szerokości okna, pod siatką jest pasek o wysokości bar_height
+class GridLayout:
+    def __init__(self, view_size, thumb_size, padding, bar_height):
+        self.thumb_size = thumb_size
+        self.padding = padding
+        self.cell_w = thumb_size[0] + padding # Szerokość kolumny
+        self.cell_h = thumb_size[1] + padding # Wysokość wiersza
+        self.cols = max(1, (view_size[0] - padding) // self.cell_w)
+        self.view = pygame.Rect(0, 0, view_size[0], max(1, view_size[1] - bar_height)) # Obszar siatki w oknie
+
+    # Prostokąt wyniku index w oknie przy przewinięciu o scroll pikseli
+    def rect(self, index, scroll):
+        row, col = divmod(index, self.cols)
+        return pygame.Rect(self.padding + col * self.cell_w, self.padding + row * self.cell_h - scroll, *self.thumb_size)
+
+    # Indeksy wyników w wierszach od first_row do last_row (włącznie)
+    def rows(self, first_row, last_row):
+        return range(max(0, first_row) * self.cols, (max(0, last_row) + 1) * self.cols)
+
+    # Wyniki widoczne przy danym przewinięciu (margin - dodatkowe wiersze nad i pod ekranem)
+    def visible(self, scroll, margin=0):
+        return self.rows(scroll // self.cell_h - margin, (scroll + self.view.height) // self.cell_h + margin)
+
+    # Indeks wyniku pod punktem okna (-1 - odstęp między kafelkami lub pasek)
+    def index_at(self, pos, scroll):
+        x, y = pos[0] - self.padding, pos[1] + scroll - self.padding
+        if not self.view.collidepoint(pos) or x < 0 or y < 0:
+            return -1
+        col, col_x = divmod(x, self.cell_w)
+        row, row_y = divmod(y, self.cell_h)
+        if col >= self.cols or col_x >= self.thumb_size[0] or row_y >= self.thumb_size[1]:
+            return -1
+        return row * self.cols + col
+
+    # Przewinięcie, przy którym wynik index jest w górnym wierszu
+    def scroll_to(self, index):
+        return (index // self.cols) * self.cell_h
+
+    # Wysokość siatki z count wynikami
+    def content_height(self, count):
+        return -(-count // self.cols) * self.cell_h + self.padding
+
+# Przewijana siatka wyników, w pamięci tylko strony wokół ekranu
+# load_page(page, generation, priority, size, on_end) zwraca listę kafelków strony (page_size wyników),
+# a przy błędzie rzuca wyjątek (strona zostanie pobrana ponownie); on_end(count) wywołuje (także później, z tła),
+# gdy strona z API okazała się ostatnia i ma count wyników - krótsza lista kafelków nie oznacza końca
+# strony są pobierane w tle, kafelki poza ekranem i marginesem oddają miniaturki (release),
+# a strony daleko od ekranu są zapominane - pamięć nie rośnie wraz z liczbą przewiniętych wyników
+# margin_rows=None - margines to cały ekran wierszy (n/b przewija od razu na wczytane miniaturki)
+# memory_budget ogranicza margines: przy dużych miniaturkach lub szerokim oknie wierszy z wyprzedzeniem jest mniej,
+# ale strony z API (bez miniaturek) są pobierane na cały ekran naprzód i wstecz
+class ScrollGrid:
+    def __init__(self, load_page, page_size, layout, margin_rows=None, memory_budget=MEMORY_BUDGET):
+        self.load_page = load_page
+        self.page_size = page_size
+        self.layout = layout
+        self.margin_rows = margin_rows # Wiersze nad i pod ekranem (najwięcej; None - ekran wierszy)
+        self.memory_budget = memory_budget # Limit pamięci na miniaturki marginesu
+        self.scroll = 0 # Przewinięcie w pikselach
+        self.pages = {} # Pobrane strony: numer -> lista kafelków
+        self.pending = set() # Strony w trakcie pobierania
+        self.failed = {} # Strony, których nie udało się pobrać: numer -> czas ponowienia
+        self.end = None # Liczba wszystkich wyników (znana, gdy API zwróci krótszą stronę)
+        self.shown = {} # Kafelki narysowane w ostatniej klatce: kafelek -> prostokąt
+        self.loaded_pages = 0 # Pobrane strony (łącznie)
+        self.dropped_pages = 0 # Strony zapomniane po odjechaniu z ekranu
+        self._range = None # Zakres (widoczne, z marginesem, rozmiar) z ostatniego update
+        self._generation = None # Pokolenie ładowania miniaturek dla tego zakresu
+        self._cleared = 0 # Liczba wyczyszczeń siatki (koniec wyników sprzed clear jest pomijany)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="grid")
+
+    # Numery stron z wynikami o podanych indeksach
+    def _pages_of(self, indices):
+        if not len(indices):
+            return set()
+        return set(range(indices.start // self.page_size + 1, (indices.stop - 1) // self.page_size + 2))
+
+    # Kafelek wyniku index albo None, jeśli jego strona nie jest pobrana
+    def tile(self, index):
+        tiles = self.pages.get(index // self.page_size + 1)
+        offset = index % self.page_size
+        return tiles[offset] if tiles is not None and offset < len(tiles) else None
+
+    # Liczba wyników, do których można przewinąć (do końca znanych stron i jedną stronę dalej)
+    def known_count(self):
+        if self.end is not None:
+            return self.end
+        return (max(self.pages, default=0) + 1) * self.page_size
+
+    def scroll_by(self, dy):
+        limit = max(0, self.layout.content_height(self.known_count()) - self.layout.view.height)
+        self.scroll = min(max(0, self.scroll + dy), limit)
+
+    # Nowy układ (zmiana rozmiaru okna lub miniaturek) - górny widoczny wynik zostaje na górze
+    def set_layout(self, layout):
+        first = self.layout.visible(self.scroll).start
+        self.layout = layout
+        self.scroll = layout.scroll_to(first)
+        self.scroll_by(0)
+
+    # Liczba wierszy na ekranie (także częściowo widocznych) - o tyle przewija n/b
+    def screen_rows(self):
+        return -(-self.layout.view.height // self.layout.cell_h)
+
+    # Wiersze marginesu (nad i pod ekranem), których miniaturki mieszczą się w memory_budget
+    def margin(self):
+        rows = self.margin_rows if self.margin_rows is not None else max(MARGIN_ROWS, self.screen_rows())
+        row_bytes = self.layout.cols * self.layout.thumb_size[0] * self.layout.thumb_size[1] * BYTES_PER_PIXEL
+        return max(0, min(rows, self.memory_budget // (2 * row_bytes)))
+
+    # Pobranie brakujących stron wokół ekranu, zlecenie miniaturek i zwolnienie reszty
+    # Wywoływane w pętli przed rysowaniem; nowe pokolenie tylko przy zmianie zakresu
+    def update(self):
+        visible = self.layout.visible(self.scroll)
+        margin = self.margin()
+        near = self.layout.visible(self.scroll, margin)
+        ahead = self.layout.visible(self.scroll, max(margin, self.screen_rows()))  # Strony z API bez limitu pamięci
+        size = self.layout.thumb_size
+        if self.end is not None:
+            visible = range(visible.start, min(visible.stop, self.end))
+            near = range(near.start, min(near.stop, self.end))
+            ahead = range(ahead.start, min(ahead.stop, self.end))
+        key = (visible.start, visible.stop, near.start, near.stop, size)
+        if key != self._range:
+            self._range = key
+            self._generation = loader_pool.get_pool().new_generation()  # Miniaturki, które zjechały z ekranu, są pomijane
+        on_screen = self._pages_of(visible)
+        wanted = self._pages_of(ahead)
+        now = time.monotonic()
+        with self._lock:
+            for page in list(self.pages):
+                if page not in wanted:
+                    del self.pages[page]
+                    self.dropped_pages += 1
+            # Najpierw strony widoczne, potem te z marginesu
+            missing = sorted((page for page in wanted if page not in self.pages and page not in self.pending
+                              and self.failed.get(page, 0) <= now),
+                             key=lambda page: (page not in on_screen, page))
+            self.pending.update(missing)
+            pages = dict(self.pages)
+            cleared = self._cleared
+        for page in missing:
+            priority = loader_pool.PRIORITY_VISIBLE if page in on_screen else loader_pool.PRIORITY_PREFETCH
+            self._executor.submit(self._load, page, self._generation, priority, size, cleared)
+        for page, tiles in pages.items():
+            for offset, tile in enumerate(tiles):
+                index = (page - 1) * self.page_size + offset
+                if index in visible:
+                    tile.schedule(self._generation, loader_pool.PRIORITY_VISIBLE, size)
+                elif index in near:
+                    tile.schedule(self._generation, loader_pool.PRIORITY_PREFETCH, size)
+                else:
+                    tile.release()
+
+    def _load(self, page, generation, priority, size, cleared):
+        try:
+            tiles = self.load_page(page, generation, priority, size, lambda count: self._on_end(cleared, page, count))
+        except Exception as e:
+            print("Błąd pobierania strony siatki:", e)
+            with self._lock:
+                if page in self.pending:
+                    self.pending.discard(page)
+                    self.failed[page] = time.monotonic() + RETRY_DELAY
+            timer = threading.Timer(RETRY_DELAY, redraw.notify)  # Pętla obudzi się i update spróbuje ponownie
+            timer.daemon = True
+            timer.start()
+            return
+        with self._lock:
+            if page not in self.pending:
+                return  # Siatka wyczyszczona w trakcie pobierania
+            self.pending.discard(page)
+            self.failed.pop(page, None)
+            self.pages[page] = tiles
+            self.loaded_pages += 1
+        self._range = None  # Nowe kafelki trzeba zlecić w bieżącym pokoleniu
+        redraw.notify()
+
+    # Strona page z API okazała się ostatnia (count wyników); cleared - stan licznika clear przy zleceniu
+    def _on_end(self, cleared, page, count):
+        with self._lock:
+            if cleared != self._cleared:
+                return  # Wynik sprzed wyczyszczenia siatki
+            count += (page - 1) * self.page_size
+            self.end = count if self.end is None else min(self.end, count)  # Koniec wyników
+        redraw.notify()
+
+    # Narysowanie widocznych wyników (szare pola dla tych, które jeszcze się wczytują)
+    def draw(self, screen):
+        screen.set_clip(self.layout.view)  # Częściowo widoczny dolny wiersz nie zasłania paska
+        screen.fill(BACKGROUND, self.layout.view)
+        self.shown = {}
+        visible = self.layout.visible(self.scroll)
+        for index in range(visible.start, visible.stop if self.end is None else min(visible.stop, self.end)):
+            rect = self.layout.rect(index, self.scroll)
+            tile = self.tile(index)
+            if tile is not None and tile.thumb_surface is not None:
+                screen.blit(tile.thumb_surface, rect)
+            else:
+                screen.fill(PLACEHOLDER_COLOR, rect)
+            if tile is not None:
+                self.shown[tile] = rect
+        screen.set_clip(None)
+
+    # Narysowanie jednego kafelka (np. po wczytaniu miniaturki); zwraca zmieniony obszar albo None
+    def draw_tile(self, screen, tile):
+        rect = self.shown.get(tile)
+        if rect is None or tile.thumb_surface is None:
+            return None
+        screen.set_clip(self.layout.view)
+        screen.blit(tile.thumb_surface, rect)
+        screen.set_clip(None)
+        return rect.clip(self.layout.view)
+
+    # Kafelek pod kursorem albo None
+    def tile_at(self, pos):
+        index = self.layout.index_at(pos, self.scroll)
+        return self.tile(index) if index >= 0 else None
+
+    # Zakres widocznych wyników (numerowanych od 1) do paska informacji
+    def visible_text(self):
+        visible = self.layout.visible(self.scroll)
+        last = visible.stop if self.end is None else min(visible.stop, self.end)
+        return f"{min(visible.start + 1, last)}-{last}" + ("" if self.end is None else f" z {self.end}")
+
+    # Zapomnienie wszystkich stron (np. po wyczyszczeniu cache)
+    def clear(self):
+        with self._lock:
+            self.pages.clear()
+            self.pending.clear()
+            self.failed.clear()
+            self.end = None
+            self._cleared += 1
+        self._range = None
+
+    def stats(self):
+        with self._lock:
+            tiles = [tile for tiles in self.pages.values() for tile in tiles]
+            return {
+                'loaded_pages': self.loaded_pages,
+                'dropped_pages': self.dropped_pages,
+                'pages': sorted(self.pages),
+                'tiles': len(tiles),
+                'surfaces': sum(tile.thumb_surface is not None for tile in tiles), # Kafelki z miniaturką w pamięci
+                'margin_rows': self.margin(), # Wiersze z wyprzedzeniem przy obecnym budżecie pamięci
+            }
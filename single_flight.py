@@ -0,0 +1,104 @@
+import threading
+
+CANCEL_POLL = 0.05 # Co ile sekund czekający sprawdza, czy zrezygnowano z wyniku
+
+# Jedno wykonanie trwającej pracy, na której wynik czeka kilka wywołań
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.progress = [] # on_progress czekających (postęp trafia do wszystkich)
+        self.cancels = [] # cancelled czekających (None - czeka do końca)
+        self.aborted = False # Praca przerwana, bo zrezygnowali wszyscy czekający
+
+    def on_progress(self, done, total):
+        for callback in list(self.progress):
+            callback(done, total)
+
+    # Przerwanie wspólnej pracy dopiero wtedy, gdy zrezygnowali wszyscy
+    def cancelled(self):
+        if all(cancel is not None and cancel() for cancel in list(self.cancels)):
+            self.aborted = True
+        return self.aborted
+
+# Łączenie równoczesnych wywołań z tym samym kluczem (single-flight):
+# pierwsze wywołanie wykonuje fn, kolejne czekają na jego wynik (albo wyjątek) zamiast powtarzać pracę
+# Wynik nie jest zapamiętywany po zakończeniu - od tego są blob_cache i surface_cache
+# Czekający może zrezygnować (cancelled); wspólna praca jest przerywana, dopiero gdy zrezygnują wszyscy
+# measure(wynik) - rozmiar wyniku w bajtach (do licznika zaoszczędzonych bajtów)
+class SingleFlight:
+    def __init__(self, measure=None):
+        self.measure = measure
+        self._flights = {} # Klucz -> trwające wykonanie
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls = 0 # Wszystkie wywołania
+            self.executed = 0 # Faktycznie wykonane prace
+            self.coalesced = 0 # Wywołania dołączone do trwającej pracy
+            self.abandoned = 0 # Dołączone, które zrezygnowały przed końcem
+            self.saved_bytes = 0 # Bajty, których nie trzeba było pobierać ponownie
+
+    # Wynik fn(on_progress, cancelled) dla klucza key, wspólny dla równoczesnych wywołań
+    # on_progress/cancelled jak w http_client.download; po rezygnacji zwraca None
+    def do(self, key, fn, on_progress=None, cancelled=None):
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None or flight.aborted  # Przerwanej pracy nie da się dokończyć - zaczynamy nową
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+            if on_progress is not None:
+                flight.progress.append(on_progress)
+            flight.cancels.append(cancelled)
+        if leader:
+            return self._run(key, flight, fn, cancelled)
+        while not flight.done.wait(CANCEL_POLL):
+            if cancelled is not None and cancelled():
+                with self._lock:
+                    self.abandoned += 1
+                    if on_progress is not None and on_progress in flight.progress:
+                        flight.progress.remove(on_progress)
+                return None  # Praca trwa dalej dla pozostałych czekających
+        if flight.aborted:
+            return self.do(key, fn, on_progress, cancelled)  # Dołączył tuż po przerwaniu - potrzebuje nowej pracy
+        if flight.error is not None:
+            raise flight.error
+        if flight.result is not None and self.measure is not None:
+            with self._lock:
+                self.saved_bytes += self.measure(flight.result)
+        return flight.result
+
+    # Wykonanie pracy przez pierwsze wywołanie (lidera) i przekazanie wyniku pozostałym
+    def _run(self, key, flight, fn, cancelled):
+        try:
+            flight.result = fn(flight.on_progress, flight.cancelled)
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+        if flight.error is not None:
+            raise flight.error
+        if cancelled is not None and cancelled():
+            return None  # Lider zrezygnował, ale pobierał dalej dla pozostałych
+        return flight.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'abandoned': self.abandoned,
+                'saved_bytes': self.saved_bytes,
+                'in_flight': len(self._flights),
+            }
@@ -0,0 +1,76 @@
+import threading
+from collections import OrderedDict
+
+MAX_BYTES = 64 * 1024 * 1024 # Limit pamięci na zdekodowane obrazy (w bajtach pikseli)
+
+# Pamięć podręczna zdekodowanych i przeskalowanych powierzchni Pygame
+# Klucz to (URL, docelowy rozmiar), przy przekroczeniu limitu usuwane są najdawniej używane
+class SurfaceCache:
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict() # (url, rozmiar) -> powierzchnia
+        self.bytes = 0 # Zajęta pamięć
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    # Rozmiar pikseli powierzchni w bajtach
+    @staticmethod
+    def surface_bytes(surface):
+        return surface.get_pitch() * surface.get_height()
+
+    def get(self, url, size):
+        key = (url, tuple(size))
+        with self._lock:
+            surface = self.entries.get(key)
+            if surface is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)  # Ostatnio używany
+            self.hits += 1
+            return surface
+
+    def put(self, url, size, surface):
+        key = (url, tuple(size))
+        nbytes = self.surface_bytes(surface)
+        if nbytes > self.max_bytes:
+            return  # Nie zmieści się nawet sama
+        with self._lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= self.surface_bytes(old)
+            self.entries[key] = surface
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= self.surface_bytes(evicted)
+
+    # Usunięcie wszystkich powierzchni (liczniki zostają)
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    # Odsetek trafień (0-100)
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return 100.0 * self.hits / total if total else 0.0
+
+    # Krótki opis do paska informacji, np. "cache 85% 12.3/64 MB"
+    def info_text(self):
+        return f"cache {self.hit_rate():.0f}% {self.bytes / 2**20:.1f}/{self.max_bytes / 2**20:.0f} MB"
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries), 'bytes': self.bytes}
+
+_cache = None # Wspólna pamięć podręczna dla całego programu
+_cache_lock = threading.Lock()
+
+# Zwraca wspólną pamięć podręczną (tworzona przy pierwszym użyciu)
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SurfaceCache()
+        return _cache
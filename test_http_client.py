@@ -0,0 +1,29 @@
+import socket
+import pytest
+import fake_api
+import http_client
+
+HOST = 'fallback.test' # Nazwa rozwiązywana w teście na dwa adresy
+
+@pytest.fixture
+def api():
+    server = fake_api.FakeApi().start()
+    yield server
+    server.stop()
+
+# Pierwszy adres odmawia połączenia (jak niedziałające IPv6) - zapytanie idzie na następny
+def test_connect_falls_back_to_next_address(api, monkeypatch):
+    resolve = socket.getaddrinfo
+    def getaddrinfo(host, port, *args, **kwargs):
+        if host != HOST:
+            return resolve(host, port, *args, **kwargs)
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (address, port)) for address in ('127.0.0.2', '127.0.0.1')]
+    monkeypatch.setattr(socket, 'getaddrinfo', getaddrinfo)
+    port = api.server.server_port
+    with pytest.raises(OSError):
+        socket.create_connection(('127.0.0.2', port), timeout=1).close()  # Pod pierwszym adresem nikt nie słucha
+    response = http_client.get(f"http://{HOST}:{port}/search?q=mars&page=1")
+    assert response.status_code == 200
+    timing = http_client.timings[-1]
+    assert timing['host'] == HOST
+    assert timing['dns'] >= 0 and timing['connect'] > 0
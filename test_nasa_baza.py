@@ -0,0 +1,61 @@
+import os
+import time
+import pytest
+import fake_api
+import nasa_api
+import nasa_cache
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+import nasa_baza
+
+LATENCY = 0.05 # Opóźnienie każdej odpowiedzi serwera testowego (w sekundach)
+SLOW = 1.0 # Dodatkowe opóźnienie /asset jednego zdjęcia strony
+SLOW_INDEX = 7 # Które zdjęcie strony odpowiada wolno
+QUERY = 'mars'
+
+# Serwer testowy z podglądami, z których nie da się wyprowadzić pełnego zdjęcia (każde wymaga zapytania /asset),
+# i pusty cache w katalogu tymczasowym; zwraca (serwer, baza, nasa_id wolnego zdjęcia)
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    server = fake_api.FakeApi(latency=LATENCY, opaque_thumbs=True).start()
+    monkeypatch.setattr(nasa_api, 'ASSET_BASE', f"{server.base_url}/asset/")
+    monkeypatch.setattr(nasa_api, '_resolved', {})
+    monkeypatch.setattr(nasa_baza, 'API_BASE', f"{server.base_url}/search?media_type=image")
+    monkeypatch.setattr(nasa_cache, 'BLOB_DIR', str(tmp_path / 'blobs'))
+    monkeypatch.setattr(nasa_cache, 'ATLAS_FILE', None)
+    monkeypatch.setattr(nasa_cache, 'BLOBS', nasa_cache.BLOBS)  # init_db podmienia magazyn zdjęć
+    db_conn = nasa_baza.init_db(str(tmp_path / 'cache.db'))
+    records, _ = nasa_api.results_page(nasa_baza.API_BASE, QUERY, 1, nasa_baza.NUM_IMAGES)
+    server.asset_latency[records[SLOW_INDEX]['nasa_id']] = SLOW
+    server.reset_stats()
+    yield server, db_conn
+    db_conn.close()
+    server.stop()
+
+# Czeka, aż wszystkie kafelki strony dostaną adres pełnego zdjęcia; zwraca czas od start
+def wait_resolved(tiles, start, timeout=10):
+    while not all(tile.full_url.endswith('~orig.jpg') for tile in tiles):
+        assert time.perf_counter() - start < timeout
+        time.sleep(0.01)
+    return time.perf_counter() - start
+
+# Zapytania /asset strony idą równolegle: czas do pełnej strony to wyszukiwanie i najwolniejsze zapytanie, a nie suma
+def test_page_build_time_tracks_slowest_asset(api):
+    server, db_conn = api
+    start = time.perf_counter()
+    tiles = nasa_baza.fetch_nasa_images(QUERY, 1, db_conn)
+    elapsed = wait_resolved(tiles, start)
+    assert len(tiles) == nasa_baza.NUM_IMAGES
+    assert server.stats()['asset'] == nasa_baza.NUM_IMAGES
+    serial = LATENCY + nasa_baza.NUM_IMAGES * LATENCY + SLOW  # Wyszukiwanie i zapytania /asset jedno po drugim
+    assert SLOW <= elapsed < SLOW + 0.5 < serial
+
+# Kafelki są gotowe od razu - strona nie czeka na wolne zapytanie /asset
+def test_page_returns_before_slow_asset(api):
+    _, db_conn = api
+    start = time.perf_counter()
+    tiles = nasa_baza.fetch_nasa_images(QUERY, 1, db_conn)
+    assert time.perf_counter() - start < SLOW / 2
+    assert not tiles[SLOW_INDEX].full_url.endswith('~orig.jpg')
+    wait_resolved(tiles, start)
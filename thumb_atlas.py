@@ -0,0 +1,115 @@
+import os
+import mmap
+import time
+import pygame
+
+SLOTS = 2048 # Liczba miejsc na miniaturki (plik ma SLOTS * szerokość * wysokość * 3 bajtów)
+PIXEL_FORMAT = 'RGB' # 3 bajty na piksel, bez kanału alfa
+TOUCH_BATCH = 64 # Po tylu odczytach czasy użycia są zapisywane w bazie
+
+# Plik z gotowymi miniaturkami jako surowe piksele RGB, każda w miejscu o stałym rozmiarze (stride)
+# Indeks URL -> numer miejsca jest w tabeli SQLite, plik jest mapowany w pamięci (mmap),
+# a powierzchnie powstają przez pygame.image.frombuffer - bez kopiowania i bez dekodowania JPEG
+# Gdy brak wolnego miejsca, zastępowana jest najdawniej używana miniaturka
+class ThumbAtlas:
+    def __init__(self, conn, lock, path, size, slots=SLOTS):
+        self.conn = conn # Połączenie z bazą (wspólne z resztą programu)
+        self.lock = lock # Blokada połączenia
+        self.size = size # Wymiary każdej miniaturki
+        self.stride = size[0] * size[1] * len(PIXEL_FORMAT) # Rozmiar jednego miejsca w bajtach
+        self.slots = slots
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._touched = {} # Odczytane adresy -> czas, zapisywane w bazie porcjami
+        with open(path, 'ab') as f:
+            pass  # Utworzenie pliku, jeśli go nie ma (zawartość zostaje)
+        with open(path, 'r+b') as f:
+            if os.fstat(f.fileno()).st_size != slots * self.stride:
+                f.truncate(slots * self.stride)  # Plik rzadki - miejsce na dysku zajmują tylko zapisane miniaturki
+            self.mm = mmap.mmap(f.fileno(), slots * self.stride)
+        self.view = memoryview(self.mm)
+        with self.lock:
+            self.conn.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS atlas (
+                    url TEXT PRIMARY KEY,  -- adres miniaturki
+                    slot INTEGER UNIQUE,   -- numer miejsca w pliku
+                    width INTEGER,         -- wymiary miejsca (inny THUMB_SIZE - atlas od nowa)
+                    height INTEGER,
+                    last_access REAL       -- czas ostatniego użycia
+                )
+                '''
+            )
+            self.conn.execute('CREATE INDEX IF NOT EXISTS atlas_last_access ON atlas(last_access)')
+            # Wpisy z innym rozmiarem miniaturek albo spoza pliku są bezużyteczne
+            self.conn.execute('DELETE FROM atlas WHERE width!=? OR height!=? OR slot>=?', (size[0], size[1], slots))
+            self.conn.commit()
+            taken = {row[0] for row in self.conn.execute('SELECT slot FROM atlas')}
+        self.free = [slot for slot in range(slots - 1, -1, -1) if slot not in taken] # Wolne miejsca (od końca listy - najniższe)
+
+    # Powierzchnia miniaturki wprost z pliku albo None, jeśli jej nie ma
+    # Powierzchnia korzysta z pamięci pliku - nie należy jej trzymać w surface_cache (miejsce może zostać zastąpione)
+    def get(self, url):
+        with self.lock:
+            row = self.conn.execute('SELECT slot FROM atlas WHERE url=?', (url,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[url] = time.time()
+            if len(self._touched) >= TOUCH_BATCH:
+                self._flush_touches()
+                self.conn.commit()
+        offset = row[0] * self.stride
+        return pygame.image.frombuffer(self.view[offset:offset + self.stride], self.size, PIXEL_FORMAT)
+
+    # Zapis miniaturki (powierzchnia o wymiarach size)
+    def put(self, url, surface):
+        pixels = pygame.image.tobytes(surface, PIXEL_FORMAT)
+        with self.lock:
+            row = self.conn.execute('SELECT slot FROM atlas WHERE url=?', (url,)).fetchone()
+            if row is not None:
+                slot = row[0]
+            elif self.free:
+                slot = self.free.pop()
+            else:
+                self._flush_touches()
+                old_url, slot = self.conn.execute('SELECT url, slot FROM atlas ORDER BY last_access LIMIT 1').fetchone()
+                self.conn.execute('DELETE FROM atlas WHERE url=?', (old_url,))
+                self._touched.pop(old_url, None)
+                self.evictions += 1
+            offset = slot * self.stride
+            self.mm[offset:offset + self.stride] = pixels
+            self.conn.execute(
+                'INSERT OR REPLACE INTO atlas(url,slot,width,height,last_access) VALUES (?,?,?,?,?)',
+                (url, slot, self.size[0], self.size[1], time.time())
+            )
+            self._flush_touches()
+            self.conn.commit()
+            self.writes += 1
+
+    # Zapis czasów odczytu (wywoływane pod blokadą)
+    def _flush_touches(self):
+        if self._touched:
+            self.conn.executemany('UPDATE atlas SET last_access=? WHERE url=?', [(t, url) for url, t in self._touched.items()])
+            self._touched.clear()
+
+    # Zapis zaległych czasów użycia (np. przy zamykaniu programu)
+    def flush(self):
+        with self.lock:
+            self._flush_touches()
+            self.conn.commit()
+        self.mm.flush()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'evictions': self.evictions,
+                'used': self.slots - len(self.free),
+                'slots': self.slots,
+            }
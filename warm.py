@@ -0,0 +1,248 @@
+import os
+import sys
+import time
+import json
+import argparse
+import contextlib
+import threading
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import http_client
+import nasa_api
+import nasa_cache
+
+# Wypełnianie cache.db bez okna (np. w nocy, przed wysłaniem bazy na kioski):
+#   python warm.py mars apollo "earth from space" --pages 10 --thumbs
+#   python warm.py --file zapytania.txt --pages 5 --rate 4 --report raport.json
+# Strony już zapisane w bazie nie są pobierane ponownie - przerwane rozgrzewanie można po prostu wznowić
+# Postęp jest wypisywany na stderr, końcowy raport (JSON) na stdout albo do pliku --report
+
+WORKERS = 8 # Liczba równoległych zapytań
+RATE = 5.0 # Limit zapytań HTTP na sekundę (0 = bez limitu)
+PROGRESS_EVERY = 5.0 # Co ile sekund wypisywany jest postęp
+
+# Równomierne rozłożenie zapytań w czasie: najwyżej rate zapytań na sekundę dla wszystkich wątków razem
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0 # Odstęp między zapytaniami
+        self.next_at = 0.0 # Najwcześniejszy czas następnego zapytania
+        self._lock = threading.Lock()
+
+    # Czeka na swoją kolej
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self.next_at)
+            self.next_at = at + self.interval
+        time.sleep(at - now)
+
+# Rozgrzewanie cache dla listy zapytań: strony wyników, adresy pełnych zdjęć i opcjonalnie miniaturki
+# fill_atlas(url, bajty) - zapis miniaturki w atlasie (None - tylko bajty w magazynie zdjęć)
+class Warmer:
+    def __init__(self, db_conn, workers=WORKERS, rate=RATE, thumbs=False, confirm=False, fill_atlas=None):
+        self.db_conn = db_conn
+        self.thumbs = thumbs # Czy zapisywać też bajty miniaturek
+        self.fill_atlas = fill_atlas # Dekodowanie i zapis w atlasie (wymaga pygame)
+        self.confirm = confirm # Czy sprawdzać adresy pełnych zdjęć wyprowadzone z miniaturek
+        self.limiter = RateLimiter(rate)
+        self.counts = {
+            'pages_total': 0,    # Strony do rozgrzania
+            'pages_fetched': 0,  # Strony pobrane z API
+            'pages_skipped': 0,  # Strony, które już były w bazie
+            'full_urls': 0,      # Ustalone adresy pełnych zdjęć
+            'thumbs': 0,         # Zapisane miniaturki
+            'thumb_bytes': 0,    # Ich łączny rozmiar
+            'requests': 0,       # Zapytania HTTP
+            'errors': 0,         # Nieudane zadania
+        }
+        self.queued_thumbs = set() # Miniaturki już zlecone (te same zdjęcia bywają w wynikach kilku zapytań)
+        self.queued_ids = set() # Zdjęcia, dla których już ustalamy pełny adres
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="warm")
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counts[name] += n
+
+    # Zapytanie HTTP z limitem
+    def request(self, fn, *args):
+        self.take_turn()
+        return fn(*args)
+
+    # Kolejka w limicie zapytań dla jednego zapytania HTTP
+    def take_turn(self):
+        self.limiter.wait()
+        self.count('requests')
+
+    # Strony z zakresu, których jeszcze nie ma w bazie
+    def missing_pages(self, qid, pages):
+        with nasa_cache.DB_LOCK:
+            present = {row[0] for row in self.db_conn.execute('SELECT page FROM pages WHERE query_id=?', (qid,))}
+        return [page for page in pages if page not in present]
+
+    # Pobranie jednej strony API i zapis wszystkich stron siatki, które się w niej mieszczą
+    # pages - lista (numer strony, ile wyników pominąć)
+    def fetch_pages(self, query, qid, api_page, pages):
+        url = nasa_api.search_url(nasa_api.SEARCH_BASE, query, api_page)
+        last = max(skip for _, skip in pages) + nasa_cache.PAGE_SIZE
+        # Każda strona API (także następna z linku next) czeka na swoją kolej w limicie
+        records = list(islice(nasa_api.iter_results(url, before_page=self.take_turn), last))
+        nasa_cache.save_items(self.db_conn, records)  # Lokalne wyszukiwanie obejmie też resztę strony API
+        for page, skip in pages:
+            nasa_cache.save_page(self.db_conn, qid, page, records[skip:skip + nasa_cache.PAGE_SIZE])
+            self.count('pages_fetched')
+        return qid, [page for page, _ in pages]
+
+    # Ustalenie adresu pełnego zdjęcia (raz dla każdego zdjęcia, niezależnie od liczby zapytań)
+    # Adres wyprowadzony z miniaturki nie wymaga zapytania; z confirm jest sprawdzany zapytaniem HEAD
+    def resolve(self, nasa_id, thumb_url):
+        if nasa_api.derive_full_url(thumb_url) is None:
+            full_url = self.request(nasa_api.resolve_full_url, nasa_id, thumb_url)
+        else:
+            full_url = nasa_api.resolve_full_url(nasa_id, thumb_url)
+            if self.confirm:
+                full_url = self.request(nasa_api.confirm_full_url, nasa_id, thumb_url, full_url)
+        nasa_cache.save_full_urls(self.db_conn, [(nasa_id, full_url)])
+        self.count('full_urls')
+
+    # Zapis bajtów miniaturki w magazynie zdjęć i gotowych pikseli w atlasie
+    def store_thumb(self, thumb_url):
+        data = self.request(nasa_cache.load_image_bytes, thumb_url)
+        self.count('thumbs')
+        self.count('thumb_bytes', len(data))
+        if self.fill_atlas is not None:
+            self.fill_atlas(thumb_url, data)
+
+    # Zadania dla zdjęć ze stron, którym czegoś brakuje (adres pełnego zdjęcia lub miniaturka)
+    def submit_items(self, qid, pages):
+        with nasa_cache.DB_LOCK:
+            rows = self.db_conn.execute(
+                f'SELECT DISTINCT i.nasa_id, i.thumb_url, i.full_url FROM query_results q '
+                f'JOIN items i ON i.nasa_id = q.nasa_id WHERE q.query_id=? '
+                f'AND q.page IN ({",".join("?" * len(pages))})',
+                (qid, *pages)
+            ).fetchall()
+        futures = []
+        for nasa_id, thumb_url, full_url in rows:
+            if full_url is None and nasa_id not in self.queued_ids:
+                self.queued_ids.add(nasa_id)
+                futures.append(self._executor.submit(self.resolve, nasa_id, thumb_url))
+            if self.thumbs and thumb_url not in self.queued_thumbs and not nasa_cache.BLOBS.contains(thumb_url):
+                self.queued_thumbs.add(thumb_url)
+                futures.append(self._executor.submit(self.store_thumb, thumb_url))
+        return futures
+
+    # Rozgrzanie stron 1..depth dla każdego zapytania
+    def run(self, queries, depth):
+        start = time.perf_counter()
+        searches = set() # Pobierane strony wyników
+        items = set() # Zadania dla pojedynczych zdjęć
+        for query in queries:
+            with nasa_cache.DB_LOCK, self.db_conn:
+                qid = nasa_cache.query_id(self.db_conn, query)
+            pages = list(range(1, depth + 1))
+            missing = self.missing_pages(qid, pages)
+            self.count('pages_total', depth)
+            self.count('pages_skipped', depth - len(missing))
+            # Kilka stron siatki mieści się w jednej stronie API - pobieramy ją tylko raz
+            by_api_page = {}
+            for page in missing:
+                api_page, skip = nasa_api.page_location(page, nasa_cache.PAGE_SIZE)
+                by_api_page.setdefault(api_page, []).append((page, skip))
+            for api_page, group in by_api_page.items():
+                searches.add(self._executor.submit(self.fetch_pages, query, qid, api_page, group))
+            present = [page for page in pages if page not in missing]
+            if present:
+                items.update(self.submit_items(qid, present))  # Wznowienie: dokończenie zapisanych stron
+
+        last_report = time.perf_counter()
+        while searches or items:
+            done, _ = wait(searches | items, timeout=PROGRESS_EVERY, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in searches:
+                    searches.discard(future)
+                    if future.exception() is None:
+                        items.update(self.submit_items(*future.result()))
+                else:
+                    items.discard(future)
+                if future.exception() is not None:
+                    self.count('errors')
+                    print("Błąd rozgrzewania:", future.exception(), file=sys.stderr)
+            if time.perf_counter() - last_report >= PROGRESS_EVERY:
+                last_report = time.perf_counter()
+                print(self.progress(last_report - start), file=sys.stderr)
+        self._executor.shutdown()
+        return self.report(time.perf_counter() - start)
+
+    # Jeden wiersz postępu
+    def progress(self, elapsed):
+        c = dict(self.counts)
+        return (
+            f"[{elapsed:.0f} s] strony {c['pages_fetched'] + c['pages_skipped']}/{c['pages_total']} "
+            f"(pominięte {c['pages_skipped']}), pełne zdjęcia {c['full_urls']}, miniaturki {c['thumbs']}, "
+            f"zapytania {c['requests']} ({c['requests'] / max(elapsed, 1e-9):.1f}/s), błędy {c['errors']}"
+        )
+
+    # Końcowy raport z przepustowością
+    def report(self, elapsed):
+        report = dict(self.counts)
+        report['seconds'] = round(elapsed, 3)
+        report['requests_per_s'] = round(report['requests'] / max(elapsed, 1e-9), 2)
+        report['http'] = http_client.timing_summary()
+        report['coalescing'] = http_client.coalescing_stats()
+        if http_client.archive_stats() is not None:
+            report['archive'] = http_client.archive_stats()
+        report['blobs'] = nasa_cache.BLOBS.stats()
+        report['full_url_resolution'] = nasa_api.resolution_stats()
+        return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rozgrzewanie cache.db bez okna programu")
+    parser.add_argument('queries', nargs='*', help="zapytania do rozgrzania")
+    parser.add_argument('--file', help="plik z zapytaniami (jedno w wierszu)")
+    parser.add_argument('--pages', type=int, default=5, help="liczba stron na zapytanie")
+    parser.add_argument('--workers', type=int, default=WORKERS, help="liczba równoległych zapytań")
+    parser.add_argument('--rate', type=float, default=RATE, help="limit zapytań na sekundę (0 = bez limitu)")
+    parser.add_argument('--thumbs', action='store_true', help="zapisuj też miniaturki (katalog --blobs)")
+    parser.add_argument('--confirm', action='store_true', help="sprawdzaj adresy pełnych zdjęć zapytaniem HEAD")
+    parser.add_argument('--db', default=nasa_cache.DB_FILE, help="plik bazy danych")
+    parser.add_argument('--blobs', default=nasa_cache.BLOB_DIR, help="katalog z zapisanymi zdjęciami")
+    parser.add_argument('--atlas', default=nasa_cache.ATLAS_FILE, help="plik atlasu miniaturek (wypełniany z --thumbs)")
+    parser.add_argument('--report', help="plik na raport JSON (domyślnie stdout)")
+    args = parser.parse_args(argv)
+
+    queries = list(args.queries)
+    if args.file:
+        with open(args.file, encoding='utf-8') as f:
+            queries += [line.strip() for line in f if line.strip()]
+    if not queries:
+        parser.error("podaj zapytania lub --file")
+
+    nasa_cache.BLOB_DIR = args.blobs
+    nasa_cache.ATLAS_FILE = args.atlas
+    with contextlib.redirect_stdout(sys.stderr):  # Komunikaty bazy i bibliotek nie mieszają się z raportem JSON
+        db_conn = nasa_cache.init_db(args.db)
+        atlas = None
+        if args.thumbs and args.atlas:
+            os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'  # Bez powitania pygame na stdout
+            import nasa_baza  # Pygame tylko do wypełniania atlasu (dekodowanie i skalowanie miniaturek)
+            nasa_baza.init_atlas(db_conn)
+            atlas = nasa_baza.ATLAS
+        report = Warmer(db_conn, args.workers, args.rate, args.thumbs, args.confirm,
+                        nasa_baza.fill_atlas if atlas is not None else None).run(queries, args.pages)
+        if atlas is not None:
+            atlas.flush()
+            report['atlas'] = atlas.stats()
+        db_conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')  # Cała zawartość w pliku .db - gotowy do skopiowania
+        db_conn.close()
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == '__main__':
+    main()